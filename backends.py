@@ -0,0 +1,647 @@
+'''Solver backends for the event formulation. A backend loads an
+eventmodel.EventModel, solves it and reports the outcome in the same terms
+whatever the solver, so that prcpsp does not depend on gurobipy. Solvers are
+imported when a backend is created, only the one in use has to be installed.
+
+    gurobi  Gurobi through gurobipy
+    highs   HiGHS through highspy, open source and without size limits
+    bnb     bnb.branch_and_bound on a timemodel.TimeModel, no MIP solver
+    heuristic  the start values only, no search
+
+Rows in m.lazy (eventmodel.LAZY) are not loaded but separated: Gurobi adds
+the ones violated by a new incumbent or node relaxation as lazy
+constraints. HiGHS has no such callback and refuses them.'''
+
+import collections
+
+import numpy as np
+import scipy.sparse as sp
+
+OPTIMAL, INFEASIBLE, TIME_LIMIT = 'optimal', 'infeasible', 'time_limit'
+# ended on reaching the stop objective, interrupted, or no schedule better
+# than the cutoff of a portfolio
+STOPPED = 'stopped'
+EPS = 1e-6
+
+
+def _finite(value):
+    # solvers report a missing bound or solution as infinite
+    return value if value is not None and abs(value) < 1e30 else None
+
+
+def _matrix(m, rows=None):
+    # CSR constraint matrix of m or of eventmodel.Rows over the columns of
+    # m, duplicates summed and zeros dropped
+    source = m if rows is None else rows
+    rows, cols, vals = source.coo()
+    A = sp.csr_matrix((vals, (rows, cols)),
+                      shape=(source.num_rows, m.num_vars))
+    A.eliminate_zeros()
+    return A
+
+
+class Backend(object):
+    '''Solves an EventModel m. After optimize(), status is one of OPTIMAL,
+    INFEASIBLE, TIME_LIMIT, STOPPED or the solver's own status name;
+    objective is the best objective found (None without a solution), bound
+    the best bound, gap the relative gap and values the column values of
+    the best solution. nodes (branch and bound nodes) and runtime (solver
+    time in seconds) add up over every optimize() and trajectory lists
+    (time, objective, bound) whenever either improves. lazy counts the
+    rows of m.lazy separated per family. portfolio, when racing in a
+    portfolio.Portfolio, hears of every improvement, may interrupt() the
+    search and sets its cutoff (see _cutoff); config names the
+    configuration.'''
+
+    # name in BACKENDS and extension of the file written by write_infeasible
+    key = None
+    infeasible_ext = None
+
+    def __init__(self, m, name, time_limit=None, threads=None):
+        self.m = m
+        self.name = name
+        self.status = None
+        self.objective = None
+        self.runtime = None
+        self.values = None
+        self.nnz = None
+        self.bound = None
+        self.gap = None
+        self.nodes = None
+        self.trajectory = []
+        self.lazy = collections.Counter()
+        self.start = None
+        self._stop = None
+        self._time_limit = time_limit
+        self._interrupted = False
+        self.portfolio = None
+        self.config = None
+
+    def _progress(self, runtime, objective, bound, values=None):
+        objective, bound = _finite(objective), _finite(bound)
+        if (objective, bound) == (None, None):
+            return
+        if not self.trajectory or \
+                self.trajectory[-1][1:] != (objective, bound):
+            self.trajectory.append((runtime, objective, bound))
+        if self.portfolio is not None:
+            self.portfolio.report(self, objective, bound, values=values)
+
+    def _shared(self):
+        # best makespan of the portfolio in this formulation and its column
+        # values if they fit this model, see portfolio.Portfolio.incumbent
+        if self.portfolio is None:
+            return None, None
+        return self.portfolio.incumbent(self)
+
+    def _cutoff(self):
+        # the shared makespan when below the upper bound of C_max: the
+        # search keeps to schedules no worse than it
+        objective = self._shared()[0]
+        m = self.m
+        if objective is None or objective >= m.ub[m.C_max] - EPS:
+            return None
+        return objective
+
+    def _reached(self, objective):
+        # the callbacks end the search once the stop objective is reached
+        return self._stop is not None and objective is not None and \
+            _finite(objective) is not None and objective <= self._stop + EPS
+
+    def _halted(self, objective):
+        # the stop objective is reached or the search was interrupted
+        return self._interrupted or self._reached(objective)
+
+    def _run(self, stop, solve, cutoff=None):
+        # solve() runs the solver once, under the cutoff if given, and
+        # returns (status, objective, bound, gap, nodes, runtime, values)
+        self._stop = stop
+        (self.status, self.objective, self.bound, self.gap, nodes, runtime,
+         self.values) = solve()
+        self.nodes = (self.nodes or 0) + nodes
+        self.runtime = (self.runtime or 0) + runtime
+        if cutoff is not None and self.status in (OPTIMAL, INFEASIBLE) and \
+                (self.objective is None or
+                 self.objective > cutoff + EPS):
+            # the model has no schedule up to the cutoff, whatever the
+            # solver makes of an empty search
+            self.status, self.objective, self.values = STOPPED, None, None
+            self.bound, self.gap = cutoff, None
+        # however the solver names an interrupted search
+        if self.status not in (OPTIMAL, INFEASIBLE) and \
+                (self._interrupted or self._reached(self.objective)):
+            self.status = STOPPED
+        m = self.m
+        if self.status == STOPPED and self.objective is not None and \
+                self.objective <= m.lb[m.C_max] + EPS:
+            # no solution is below the lower bound of C_max
+            self.status, self.bound, self.gap = OPTIMAL, self.objective, 0.
+
+    def _separate(self, *xs):
+        '''Rows of m.lazy violated by any of the column values xs as
+        eventmodel.Rows, None if they satisfy them all.'''
+        pool = self.m.lazy
+        xs = [x for x in xs if x is not None]
+        if not xs or pool.num_rows == 0:
+            return None
+        keep = np.nonzero(np.any([pool.residual(np.asarray(x)) > EPS
+                                  for x in xs], axis=0))[0]
+        if len(keep) == 0:
+            return None
+        rows = pool.select(keep)
+        self.lazy.update(name.split('[')[0] for name in rows.row_names)
+        return rows
+
+    def value(self, name):
+        return self.values[self.m.names.index(name)]
+
+    def set_start(self, x):
+        '''Column values x of a feasible solution to start from.'''
+        raise NotImplementedError
+
+    def set_bounds(self, col, lb, ub):
+        '''Changes the bounds of column col, in m as well.'''
+        raise NotImplementedError
+
+    def set_time_limit(self, seconds):
+        raise NotImplementedError
+
+    def set_params(self, params):
+        '''Solver specific parameters {name: value}.'''
+        raise NotImplementedError
+
+    def interrupt(self):
+        '''Ends a running optimize() early, from another thread; the best
+        solution found so far is kept.'''
+        self._interrupted = True
+
+    def optimize(self, stop=None):
+        '''Solves the model. With stop, the search ends as soon as a
+        solution is no worse than stop (status STOPPED), or OPTIMAL when
+        stop is at most the lower bound of C_max.'''
+        raise NotImplementedError
+
+    def write_solution(self, path):
+        raise NotImplementedError
+
+    def dispose(self):
+        '''Frees the solver's copy of the model, results stay available.'''
+        raise NotImplementedError
+
+    def write_infeasible(self, path):
+        raise NotImplementedError
+
+
+class GurobiBackend(Backend):
+    '''The model is loaded with the matrix API, model holds the gurobipy
+    Model and x its MVar for solver specific extensions. Every backend has
+    its own environment, so several can solve in threads of one
+    process.'''
+
+    key = 'gurobi'
+    infeasible_ext = '.ilp'
+
+    def __init__(self, m, name, time_limit=None, threads=None):
+        Backend.__init__(self, m, name, time_limit, threads)
+        import gurobipy as grb
+        self.env = grb.Env()
+        self.model = model = grb.Model(name, env=self.env)
+        if time_limit is not None:
+            model.setParam('TimeLimit', time_limit)
+        if threads:
+            model.setParam('Threads', threads)
+        if m.lazy.num_rows:
+            model.setParam('LazyConstraints', 1)
+        self.x = model.addMVar(m.num_vars, lb=m.lb, ub=m.ub, obj=m.obj,
+                               vtype=m.vtype)
+        A = _matrix(m)
+        self.nnz = A.nnz
+        constrs = model.addMConstr(A, self.x, np.array(m.sense),
+                                   np.array(m.rhs))
+        model.update()
+        model.setAttr("VarName", self.x.tolist(), m.names)
+        model.setAttr("ConstrName", constrs.tolist(), m.row_names)
+        model.update()
+        self._vars = self.x.tolist()
+
+    def set_start(self, x):
+        self.start = x
+        self.x.Start = x
+
+    def set_bounds(self, col, lb, ub):
+        self.m.lb[col], self.m.ub[col] = lb, ub
+        self.x[col].LB, self.x[col].UB = lb, ub
+
+    def set_time_limit(self, seconds):
+        self._time_limit = seconds
+        self.model.setParam('TimeLimit', seconds)
+
+    def set_params(self, params):
+        for name, value in params.items():
+            self.model.setParam(name, value)
+
+    def interrupt(self):
+        Backend.interrupt(self)
+        if self.model is not None:
+            self.model.terminate()
+
+    def _add_lazy(self, model, x):
+        # violated rows of m.lazy as lazy constraints, from a callback
+        import gurobipy as grb
+        rows = self._separate(x)
+        if rows is None:
+            return
+        A = _matrix(self.m, rows)
+        for k in range(rows.num_rows):
+            start, end = A.indptr[k], A.indptr[k + 1]
+            model.cbLazy(grb.LinExpr(A.data[start:end].tolist(),
+                                     [self._vars[c] for c in
+                                      A.indices[start:end]]),
+                         rows.sense[k], rows.rhs[k])
+
+    def optimize(self, stop=None):
+        from gurobipy import GRB
+
+        def _callback(model, where):
+            if where == GRB.Callback.MIP:
+                objective = model.cbGet(GRB.Callback.MIP_OBJBST)
+                self._progress(model.cbGet(GRB.Callback.RUNTIME), objective,
+                               model.cbGet(GRB.Callback.MIP_OBJBND))
+                if self._halted(objective):
+                    model.terminate()
+            elif where == GRB.Callback.MIPSOL and self.m.lazy.num_rows:
+                self._add_lazy(model, model.cbGetSolution(self._vars))
+            elif where == GRB.Callback.MIPSOL and self.portfolio is not None:
+                # the schedule itself, for members with the same columns
+                self._progress(model.cbGet(GRB.Callback.RUNTIME),
+                               model.cbGet(GRB.Callback.MIPSOL_OBJ),
+                               model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+                               model.cbGetSolution(self._vars))
+            elif where == GRB.Callback.MIPNODE:
+                objective, values = self._shared()
+                if values is not None and objective != self._given and \
+                        objective < model.cbGet(
+                            GRB.Callback.MIPNODE_OBJBST) - EPS:
+                    self._given = objective
+                    model.cbSetSolution(self._vars, values)
+                if self.m.lazy.num_rows and \
+                        model.cbGet(GRB.Callback.MIPNODE_STATUS) == \
+                        GRB.OPTIMAL:
+                    self._add_lazy(model, model.cbGetNodeRel(self._vars))
+
+        def _solve():
+            model = self.model
+            model.setParam('Cutoff', GRB.INFINITY if cutoff is None
+                           else cutoff)
+            model.optimize(_callback)
+            # CUTOFF: no schedule up to the cutoff, see Backend._run
+            status = {GRB.OPTIMAL: OPTIMAL, GRB.INFEASIBLE: INFEASIBLE,
+                      GRB.CUTOFF: INFEASIBLE,
+                      GRB.TIME_LIMIT: TIME_LIMIT}.get(model.Status,
+                                                     str(model.Status))
+            found = model.SolCount > 0
+            bound = _finite(model.ObjBound) if status != INFEASIBLE else None
+            return (status, model.ObjVal if found else None, bound,
+                    _finite(model.MIPGap) if found else None,
+                    int(model.NodeCount), model.Runtime,
+                    self.x.X if found else None)
+
+        cutoff = self._cutoff()
+        self._given = None
+        self._run(stop, _solve, cutoff)
+
+    def write_solution(self, path):
+        self.model.write(path)
+
+    def write_infeasible(self, path):
+        # irreducible inconsistent subsystem
+        self.model.computeIIS()
+        self.model.write(path)
+
+    def dispose(self):
+        self.model.dispose()
+        self.env.dispose()
+        self.model = self.env = self.x = self._vars = None
+
+
+class HighsBackend(Backend):
+    '''HiGHS has no IIS for MIPs, write_infeasible writes the whole model.
+    It has no lazy constraint callback either, a model with rows in m.lazy
+    raises ValueError.'''
+
+    key = 'highs'
+    infeasible_ext = '.lp'
+
+    def __init__(self, m, name, time_limit=None, threads=None):
+        Backend.__init__(self, m, name, time_limit, threads)
+        if m.lazy.num_rows:
+            raise ValueError('HiGHS cannot separate lazy constraints, '
+                             'use the gurobi backend')
+        import highspy
+        self.highs = h = highspy.Highs()
+        if time_limit is not None:
+            h.setOptionValue('time_limit', float(time_limit))
+        if threads:
+            h.setOptionValue('threads', int(threads))
+        A = _matrix(m)
+        self.nnz = A.nnz
+        sense = np.array(m.sense)
+        rhs = np.array(m.rhs)
+        lp = highspy.HighsLp()
+        lp.model_name_ = name
+        lp.num_col_, lp.num_row_ = m.num_vars, m.num_rows
+        lp.col_cost_ = m.obj
+        lp.col_lower_ = m.lb
+        lp.col_upper_ = np.where(np.isinf(m.ub), highspy.kHighsInf, m.ub)
+        lp.row_lower_ = np.where(sense == '<', -highspy.kHighsInf, rhs)
+        lp.row_upper_ = np.where(sense == '>', highspy.kHighsInf, rhs)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.num_col_, lp.a_matrix_.num_row_ = A.shape[1], A.shape[0]
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        lp.integrality_ = [highspy.HighsVarType.kInteger if v == 'B'
+                           else highspy.HighsVarType.kContinuous
+                           for v in m.vtype]
+        lp.col_names_ = m.names
+        lp.row_names_ = m.row_names
+        h.passModel(lp)
+
+        def _callback(event, values=None):
+            out = event.data_out
+            # the primal bound is the cutoff until a schedule is found, the
+            # start included
+            objective = self._incumbent[0] \
+                if self._incumbent is not None else None
+            self._progress(out.running_time, objective, out.mip_dual_bound,
+                           values)
+            # the flag outlives the run, a later one would stop at once
+            event.data_in.user_interrupt = self._halted(objective)
+
+        def _improved(event):
+            out = event.data_out
+            self._incumbent = (out.objective_function_value,
+                               np.array(out.mip_solution))
+            _callback(event, self._incumbent[1])
+
+        def _offer(event):
+            # the schedule of another member with the same columns
+            objective, values = self._shared()
+            if values is not None and objective != self._given and \
+                    (self._incumbent is None or
+                     objective < self._incumbent[0] - EPS):
+                self._given = objective
+                event.data_in.setSolution(values)
+
+        self._incumbent = None
+        self._given = None
+        h.cbMipImprovingSolution.subscribe(_improved)
+        h.cbMipUserSolution.subscribe(_offer)
+        h.cbMipLogging.subscribe(_callback)
+        h.cbMipInterrupt.subscribe(_callback)
+
+    def set_start(self, x):
+        import highspy
+        self.start = x
+        solution = highspy.HighsSolution()
+        solution.col_value = list(x)
+        self.highs.setSolution(solution)
+
+    def set_bounds(self, col, lb, ub):
+        self.m.lb[col], self.m.ub[col] = lb, ub
+        self.highs.changeColBounds(int(col), lb, ub)
+
+    def set_time_limit(self, seconds):
+        self._time_limit = seconds
+        self.highs.setOptionValue('time_limit', float(seconds))
+
+    def set_params(self, params):
+        for name, value in params.items():
+            self.highs.setOptionValue(name, value)
+
+    def optimize(self, stop=None):
+        import highspy
+        h = self.highs
+
+        def _solve():
+            start = h.getRunTime()
+            self._incumbent = None
+            h.setOptionValue('objective_bound', highspy.kHighsInf
+                             if cutoff is None else float(cutoff))
+            h.run()
+            status = h.getModelStatus()
+            status = {
+                highspy.HighsModelStatus.kOptimal: OPTIMAL,
+                highspy.HighsModelStatus.kInfeasible: INFEASIBLE,
+                highspy.HighsModelStatus.kTimeLimit: TIME_LIMIT,
+            }.get(status, h.modelStatusToString(status))
+            info = h.getInfo()
+            objective, values = self._incumbent or (None, None)
+            # the solution status and value can be left over from an
+            # earlier run with wider bounds, the start is only reported
+            # here though
+            m = self.m
+            if objective is None and info.primal_solution_status == 2 and \
+                    status != INFEASIBLE and \
+                    info.objective_function_value <= m.ub[m.C_max] + EPS:
+                objective = info.objective_function_value
+                values = np.array(h.getSolution().col_value)
+            bound = _finite(info.mip_dual_bound) \
+                if status != INFEASIBLE else None
+            return (status, objective, bound,
+                    _finite(info.mip_gap) if objective is not None else None,
+                    int(info.mip_node_count), h.getRunTime() - start, values)
+
+        cutoff = self._cutoff()
+        self._given = None
+        self._run(stop, _solve, cutoff)
+
+    def write_solution(self, path):
+        self.highs.writeSolution(path, 0)
+
+    def write_infeasible(self, path):
+        self.highs.writeModel(path)
+
+    def dispose(self):
+        self.highs.clear()
+        self.highs = None
+
+
+class BranchAndBoundBackend(Backend):
+    '''Searches schedules of a timemodel.TimeModel with bnb, the rows are
+    not used: the instance comes from the model and a schedule is written
+    back as its column values. Activities are released at ES and due at
+    LS + p. write_solution writes the nonzero columns, write_infeasible
+    the makespan bound that has no schedule.'''
+
+    key = 'bnb'
+    infeasible_ext = '.txt'
+
+    def __init__(self, m, name, time_limit=None, threads=None):
+        Backend.__init__(self, m, name, time_limit, threads)
+        if getattr(m, 'formulation', None) != 'time':
+            raise ValueError('the bnb backend needs the time-indexed '
+                             'formulation')
+        self.nnz = 0
+
+    def _periods(self, x):
+        # periods of each activity in the column values x
+        m = self.m
+        return [[t for t in range(*m.window[i]) if x[m.x(i, t)] > 0.5]
+                for i in m.V]
+
+    def _values(self, periods):
+        # column values of a schedule given by its periods, activities of
+        # zero duration as early as their predecessors allow
+        m = self.m
+        x = np.zeros(m.num_vars)
+        for k, (i, ts) in enumerate(zip(m.V, periods)):
+            ts = np.array(ts, dtype=int)
+            x[m.x(i, ts)] = 1
+            x[m.S(i)] = ts.min() if len(ts) else m.ES[k]
+            x[m.C(i)] = ts.max() + 1 if len(ts) else x[m.S(i)]
+        changed = True
+        while changed:
+            changed = False
+            for (i, j) in m.arcs:
+                if m.p[j - m.V[0]] == 0 and x[m.S(j)] < x[m.C(i)]:
+                    x[m.S(j)] = x[m.C(j)] = x[m.C(i)]
+                    changed = True
+        x[m.C_max] = x[m.C(np.array(m.V))].max()
+        return x
+
+    def set_start(self, x):
+        self.start = x
+
+    def set_bounds(self, col, lb, ub):
+        self.m.lb[col], self.m.ub[col] = lb, ub
+
+    def set_time_limit(self, seconds):
+        self._time_limit = seconds
+
+    def set_params(self, params):
+        if params:
+            raise ValueError('the bnb backend has no parameters: %s' %
+                             ', '.join(sorted(params)))
+
+    def optimize(self, stop=None):
+        import bnb
+        m = self.m
+
+        def _improved(runtime, objective, bound, periods):
+            # the schedule itself only matters to a portfolio
+            self._progress(runtime, objective, bound,
+                           self._values(periods)
+                           if self.portfolio is not None else None)
+
+        def _known():
+            # makespans of the time-indexed model are whole periods
+            objective = self._shared()[0]
+            return int(np.floor(objective + EPS)) \
+                if objective is not None else None
+
+        def _solve():
+            lb, ub = m.lb[m.C_max], m.ub[m.C_max]
+            incumbent = None
+            if self.start is not None and \
+                    self.start[m.C_max] <= ub + EPS:
+                incumbent = (int(round(self.start[m.C_max])),
+                             self._periods(self.start))
+            origin = m.V[0]
+            result = bnb.branch_and_bound(
+                m.p, m.demand, m.R,
+                [(i - origin, j - origin) for (i, j) in m.arcs],
+                m.ES, m.LS + m.p, int(np.ceil(lb - EPS)),
+                int(np.floor(ub + EPS)) if np.isfinite(ub) else None,
+                incumbent, stop, self._time_limit, _improved,
+                lambda: self._interrupted, _known)
+            status = {bnb.OPTIMAL: OPTIMAL, bnb.INFEASIBLE: INFEASIBLE,
+                      bnb.TIME_LIMIT: TIME_LIMIT,
+                      bnb.STOPPED: STOPPED}[result.status]
+            found = result.objective is not None
+            gap = (result.objective - result.bound) / result.objective \
+                if found and result.objective else None
+            values = self._values(result.periods) if found else None
+            return (status, float(result.objective) if found else None,
+                    result.bound, gap, result.nodes, result.runtime,
+                    values)
+
+        self._run(stop, _solve)
+
+    def write_solution(self, path):
+        _write_columns(self, path)
+
+    def write_infeasible(self, path):
+        with open(path, 'w') as file_out:
+            file_out.write('No schedule with C_max <= %s\n' %
+                           self.m.ub[self.m.C_max])
+
+    def dispose(self):
+        pass
+
+
+class HeuristicBackend(Backend):
+    '''No search, the solution is the start (the list schedule of
+    heuristic.warm_start) if within the bounds of C_max, status
+    'heuristic'. A baseline, and the heuristic-only member of a
+    portfolio.'''
+
+    key = 'heuristic'
+    infeasible_ext = '.txt'
+
+    def __init__(self, m, name, time_limit=None, threads=None):
+        Backend.__init__(self, m, name, time_limit, threads)
+        self.nnz = 0
+
+    def set_start(self, x):
+        self.start = x
+
+    def set_bounds(self, col, lb, ub):
+        self.m.lb[col], self.m.ub[col] = lb, ub
+
+    def set_time_limit(self, seconds):
+        self._time_limit = seconds
+
+    def set_params(self, params):
+        if params:
+            raise ValueError('the heuristic backend has no parameters: %s' %
+                             ', '.join(sorted(params)))
+
+    def optimize(self, stop=None):
+        m = self.m
+
+        def _solve():
+            x = self.start
+            if x is None or x[m.C_max] > m.ub[m.C_max] + EPS:
+                return 'heuristic', None, None, None, 0, 0., None
+            objective = float(m.obj.dot(x))
+            self._progress(0., objective, None)
+            return 'heuristic', objective, None, None, 0, 0., x
+
+        self._run(stop, _solve)
+
+    def write_solution(self, path):
+        _write_columns(self, path)
+
+    def write_infeasible(self, path):
+        with open(path, 'w') as file_out:
+            file_out.write('No start with C_max <= %s\n' %
+                           self.m.ub[self.m.C_max])
+
+    def dispose(self):
+        pass
+
+
+def _write_columns(solver, path):
+    # the nonzero columns of the solution, as name value lines
+    with open(path, 'w') as file_out:
+        file_out.write('# Objective value = %s\n' % solver.objective)
+        if solver.values is not None:
+            for k in np.nonzero(solver.values)[0]:
+                file_out.write('%s %s\n' % (solver.m.names[k],
+                                            solver.values[k]))
+
+
+BACKENDS = dict((backend.key, backend)
+                for backend in (GurobiBackend, HighsBackend,
+                                BranchAndBoundBackend, HeuristicBackend))
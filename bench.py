@@ -0,0 +1,166 @@
+'''Benchmark of lcalg: time per stage, peak memory and bound quality over a
+set of instances, and a diff of two runs that flags regressions.
+
+    python bench.py run "./input/j30/*.sm" bench.json [--optima j30opt.sm]
+    python bench.py diff old.json new.json [--tolerance 0.2]
+
+Bound quality is LB_2 against the known optimum (or best known makespan),
+read from a PSPLIB solution file such as j30opt.sm when given, the
+average window LS - ES of the activities and how much each stage tightens
+them (lcalg.algorithm, tightening). diff exits with status 1 when
+any stage got slower by more than the tolerance, or an instance got a
+weaker bound or wider windows.'''
+
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+import numpy as np
+
+import lcalg
+from psplib import read
+
+STAGES = ['conflicts', 'path_consistency', 'immediate_selection',
+          'timetabling', 'energetic', 'symmetric_triples', 'upper_bound',
+          'edge_finding', 'destructive']
+# stages reported by lcalg.algorithm in tightening
+TIGHTENING = ['path_consistency', 'timetabling', 'energetic', 'upper_bound',
+              'edge_finding', 'destructive']
+
+
+def read_optima(path):
+    '''{(i, j): makespan} from a PSPLIB solution file, whose rows start
+    with the parameter, the instance and the makespan.'''
+    optima = {}
+    with open(path) as f:
+        for line in f:
+            row = line.split()
+            if len(row) >= 3 and all(x.isdigit() for x in row[:3]):
+                optima[int(row[0]), int(row[1])] = int(row[2])
+    return optima
+
+
+def _key(name):
+    # 'j3012_4' -> (12, 4)
+    match = re.match(r'^j(?:30|60|90|120)(\d+)_(\d+)$', name)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def run(pattern, optima=None):
+    '''Runs lcalg.algorithm on every file matching pattern, once timed and
+    once under tracemalloc for the peak memory.'''
+    instances = {}
+    for path in sorted(glob.glob(pattern)):
+        instance = read(path)
+        data = instance.to_data()
+        timings, tightening = {}, {}
+        start = time.time()
+        n, T, K, p, R, r, E, V, A, ES, LS, LB_2 = lcalg.algorithm(
+            data, timings, tightening)
+        total = time.time() - start
+        tracemalloc.start()
+        lcalg.algorithm(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result = dict((stage, timings.get(stage, 0)) for stage in STAGES)
+        result.update(total=total, peak=peak, LB_2=LB_2,
+                      window=float(np.mean([LS[k] - ES[k] for k in ES])),
+                      tightening=dict((stage, tightening.get(stage, 0))
+                                      for stage in TIGHTENING),
+                      optimum=None, gap=None)
+        optimum = (optima or {}).get(_key(instance.name))
+        if optimum:
+            result.update(optimum=optimum,
+                          gap=float(optimum - LB_2) / optimum)
+        instances[instance.name] = result
+    return instances
+
+
+def summary(instances):
+    rows = list(instances.values())
+    total = dict((stage, sum(row[stage] for row in rows))
+                 for stage in STAGES + ['total'])
+    gaps = [row['gap'] for row in rows if row['gap'] is not None]
+    total.update(instances=len(rows),
+                 peak=max([row['peak'] for row in rows] + [0]),
+                 window=float(np.mean([row['window'] for row in rows]))
+                 if rows else None,
+                 gap=float(np.mean(gaps)) if gaps else None,
+                 optimal=sum(row['gap'] == 0 for row in rows),
+                 tightening=dict((stage, sum(row['tightening'][stage]
+                                             for row in rows))
+                                 for stage in TIGHTENING))
+    return total
+
+
+def diff(old, new, tolerance=0.2):
+    '''Lines describing the changes from run old to run new and whether
+    any of them is a regression.'''
+    lines, regression = [], False
+    a, b = old['summary'], new['summary']
+    for stage in STAGES + ['total', 'peak']:
+        # stages missing from older runs took no time
+        x, y = a.get(stage, 0), b.get(stage, 0)
+        change = (y - x) / x if x else 0
+        flag = change > tolerance
+        regression |= flag
+        lines.append('%-20s %12.4g %12.4g %+8.1f%%%s' % (
+            stage, x, y, 100 * change,
+            '  REGRESSION' if flag else ''))
+    for name in sorted(set(old['instances']) & set(new['instances'])):
+        x, y = old['instances'][name], new['instances'][name]
+        if y['LB_2'] < x['LB_2'] or y['window'] > x['window']:
+            regression = True
+            lines.append('%s: LB_2 %s -> %s, window %.2f -> %.2f  '
+                         'REGRESSION' % (name, x['LB_2'], y['LB_2'],
+                                         x['window'], y['window']))
+        elif y['LB_2'] > x['LB_2']:
+            lines.append('%s: LB_2 %s -> %s' % (name, x['LB_2'], y['LB_2']))
+    return lines, regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.
+                                     RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('run', help='benchmark a set')
+    command.add_argument('pattern', help='instance files, e.g. '
+                                         '"./input/j30/*.sm"')
+    command.add_argument('output', help='JSON file to write')
+    command.add_argument('--optima', default=None,
+                         help='PSPLIB file of optimal makespans')
+    command = commands.add_parser('diff', help='compare two runs')
+    command.add_argument('old')
+    command.add_argument('new')
+    command.add_argument('--tolerance', type=float, default=0.2,
+                         help='relative slow down flagged as regression')
+    args = parser.parse_args()
+    if args.command == 'run':
+        optima = read_optima(args.optima) if args.optima else None
+        instances = run(args.pattern, optima)
+        result = {'pattern': args.pattern, 'version': lcalg.VERSION,
+                  'python': platform.python_version(),
+                  'numpy': np.__version__, 'instances': instances,
+                  'summary': summary(instances)}
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+        for key, value in sorted(result['summary'].items()):
+            print('%-20s %s' % (key, value))
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        lines, regression = diff(old, new, args.tolerance)
+        print('\n'.join(lines))
+        sys.exit(1 if regression else 0)
+
+
+if __name__ == '__main__':
+    main()
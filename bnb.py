@@ -0,0 +1,238 @@
+'''Branch and bound for the preemptive RCPSP over unit time slices, without
+a MIP solver. The search is chronological: at every time t a maximal set
+of eligible activities (predecessors finished, released, resources fit) is
+processed in [t, t + 1), which is dominant with preemption. The arcs stay
+those of the instance: every node only moves the heads of the activities
+left, from their releases and work left along the distances b of lcalg
+(longest paths over the arcs, one pass as b is closed), and is pruned when
+
+    an activity cannot finish by its deadline (LS + p),
+    the heads, work left and tails, the energy left or LB_2 exceed the
+    incumbent, or
+    the same work is left at an earlier time on a node already searched.
+
+Activities are numbered 0..nv-1 here, see backends.BranchAndBoundBackend
+for the mapping from a timemodel.TimeModel.'''
+
+import collections
+import time
+
+import numpy as np
+
+from lcalg import _closure
+
+OPTIMAL, INFEASIBLE, TIME_LIMIT = 'optimal', 'infeasible', 'time_limit'
+STOPPED = 'stopped'
+# nodes between two looks at the clock
+CHECK_EVERY = 1000
+# work left remembered for the dominance rule, all forgotten once there are
+# more, it only prunes
+SEEN_LIMIT = 10 ** 6
+
+Result = collections.namedtuple(
+    'Result', 'status objective bound nodes runtime periods')
+Result.__doc__ = '''Outcome of branch_and_bound: objective is the best
+makespan (None without a schedule), bound a lower bound, periods the
+periods [t, t + 1) each activity is processed in, None without a
+schedule.'''
+
+
+def distances(p, arcs):
+    '''Longest path lengths b[i, j] from the start of i to the start of j
+    over arcs i -> j of length p[i], -inf-like where j does not follow i;
+    the closure of lcalg.'''
+    nv = len(p)
+    # lcalg keeps row and column 0 aside
+    B = np.full((nv + 1, nv + 1), -2 ** 30, dtype=np.int64)
+    np.fill_diagonal(B, 0)
+    for (i, j) in arcs:
+        B[i + 1, j + 1] = max(B[i + 1, j + 1], p[i])
+    return _closure(B)[1:, 1:]
+
+
+def branch_and_bound(p, demand, R, arcs, release, deadline, lb, ub=None,
+                     incumbent=None, stop=None, time_limit=None,
+                     progress=None, stopped=None, cutoff=None):
+    '''Shortest preemptive schedule of activities with durations p,
+    demands demand (nv x K) on capacities R, precedences arcs [(i, j)],
+    processed from release[i] and done by deadline[i]. lb is a lower bound
+    of the makespan and only makespans up to ub are searched. incumbent,
+    (makespan, periods) of a known schedule, is to be beaten. The search
+    ends once the makespan is at most stop, after time_limit seconds, or
+    when exhausted, or once stopped() is true (status TIME_LIMIT).
+    progress(runtime, objective, bound, periods) is called on every new
+    incumbent. cutoff(), if given, is a makespan known from elsewhere
+    (None without one) and only shorter schedules are searched; an
+    exhausted search is STOPPED then, with it as the bound. Raises
+    ValueError on a schedule shorter than lb, the bounds do not hold for
+    the instance then.'''
+    start = time.time()
+    p = np.asarray(p, dtype=np.int64)
+    demand = np.asarray(demand, dtype=np.int64).reshape(len(p), -1)
+    R = np.asarray(R, dtype=np.int64)
+    release = np.asarray(release, dtype=np.int64)
+    deadline = np.asarray(deadline, dtype=np.int64)
+    nv = len(p)
+    b = distances(p, arcs)
+    prec = (b > -2 ** 29) & ~np.eye(nv, dtype=bool)
+    # from the completion of i to the start of j, and from the completion
+    # of i to the end of the project
+    lag = np.where(prec, b - p[:, None], -2 ** 30)
+    tail = np.where(prec, lag + p[None, :], 0).max(axis=1, initial=0)
+    # releases and deadlines along the distances, activities of zero
+    # duration hold up their successors and the end of the project
+    release = np.maximum(release, np.where(
+        prec, release[:, None] + b, -2 ** 30).max(axis=0))
+    deadline = np.minimum(deadline, np.where(
+        prec, deadline[None, :] - lag - p[None, :], 2 ** 30).min(axis=1))
+    lb = int(max(lb, (release + p + tail).max(initial=0)))
+    floor = int(release[p == 0].max(initial=0))
+    best, best_periods = (None, None) if incumbent is None else incumbent
+    if best is not None and best < lb:
+        raise ValueError('incumbent of makespan %s below the lower bound '
+                         '%s' % (best, lb))
+    if best is not None and ub is not None and best > ub:
+        best, best_periods = None, None
+    limit = ub if ub is not None else np.inf
+
+    def _bound(t, rem):
+        # lower bound of the makespan from a node, None if it misses a
+        # deadline
+        U = rem > 0
+        if not U.any():
+            return max(t, floor)
+        head = np.maximum(release[U], t)
+        pred = prec[np.ix_(U, U)]
+        if pred.any():
+            reach = np.where(pred, (head + rem[U])[:, None] +
+                             lag[np.ix_(U, U)], -2 ** 30)
+            head = np.maximum(head, reach.max(axis=0))
+        finish = head + rem[U]
+        if (finish > deadline[U]).any():
+            return None
+        energy = (rem[U] @ demand[U] + R - 1) // np.maximum(R, 1)
+        return int(max((finish + tail[U]).max(), t + energy.max(initial=0),
+                       lb))
+
+    rows = [tuple(row) for row in demand.tolist()]
+
+    def _fits(e, free):
+        return all(d <= f for d, f in zip(rows[e], free))
+
+    def _maximal(eligible, free):
+        # maximal feasible subsets of eligible, in priority order, the
+        # greedy one first
+        def _sets(k, free, chosen, left_out):
+            if k == len(eligible):
+                if not any(_fits(e, free) for e in left_out):
+                    yield chosen
+                return
+            e = eligible[k]
+            if _fits(e, free):
+                for subset in _sets(k + 1, tuple(f - d for f, d in
+                                                 zip(free, rows[e])),
+                                    chosen + [e], left_out):
+                    yield subset
+            for subset in _sets(k + 1, free, chosen, left_out + [e]):
+                yield subset
+        return _sets(0, free, [], [])
+
+    rem0 = p.copy()
+    root = _bound(0, rem0)
+    if root is None:
+        root = limit + 1
+    bound = root
+    # nodes are (t, work left, path), path is (slice set, its time,
+    # parent path)
+    stack = [(0, rem0, None)]
+    seen = {}
+    # the maximal sets of each order of eligible activities
+    sets = {}
+    nodes = 0
+    status = None
+    # the smallest makespan from cutoff()
+    known = None
+    while stack:
+        found = cutoff() if cutoff is not None else None
+        if found is not None and (known is None or found < known):
+            known = found
+        target = min(limit, best - 1 if best is not None else np.inf,
+                     known - 1 if known is not None else np.inf)
+        if best is not None and (best <= root or
+                                 (stop is not None and best <= stop)):
+            status = OPTIMAL if best <= root else STOPPED
+            break
+        if known is not None and known <= root:
+            status = STOPPED
+            break
+        t, rem, path = stack.pop()
+        nodes += 1
+        if stopped is not None and stopped() or \
+                time_limit is not None and nodes % CHECK_EVERY == 0 and \
+                time.time() - start > time_limit:
+            status = TIME_LIMIT
+            break
+        low = _bound(t, rem)
+        if low is None or low > target:
+            continue
+        U = rem > 0
+        if not U.any():
+            if max(t, floor) < lb:
+                raise ValueError('schedule of makespan %s below the lower '
+                                 'bound %s' % (max(t, floor), lb))
+            best, best_periods = max(t, floor), _periods(path, nv)
+            if progress is not None:
+                progress(time.time() - start, best, bound, best_periods)
+            continue
+        waiting = prec[U].any(axis=0)
+        ready = U & ~waiting
+        eligible = ready & (release <= t)
+        if not eligible.any():
+            # idle until the next release
+            stack.append((int(release[ready].min()), rem, path))
+            continue
+        order = np.nonzero(eligible)[0]
+        order = order[np.argsort(-(tail[order] + rem[order]),
+                                 kind='stable')]
+        order = tuple(order.tolist())
+        if order not in sets:
+            if len(sets) >= SEEN_LIMIT:
+                sets.clear()
+            sets[order] = list(_maximal(order, tuple(R.tolist())))
+        children = []
+        for chosen in sets[order]:
+            child = rem.copy()
+            child[chosen] -= 1
+            key = child.tobytes()
+            if seen.get(key, np.inf) <= t + 1:
+                continue
+            if len(seen) >= SEEN_LIMIT:
+                seen.clear()
+            seen[key] = t + 1
+            children.append((t + 1, child, (chosen, t, path)))
+        # the greedy set is searched first
+        stack.extend(reversed(children))
+    if status is None and known is not None and \
+            (best is None or known < best):
+        # no schedule shorter than known
+        status, bound = STOPPED, known
+    if status is None:
+        status = OPTIMAL if best is not None else INFEASIBLE
+    if status == OPTIMAL:
+        bound = best
+    elif status == INFEASIBLE:
+        bound = None
+    else:
+        bound = min(bound, best) if best is not None else bound
+    return Result(status, best, bound, nodes, time.time() - start,
+                  best_periods)
+
+
+def _periods(path, nv):
+    # periods of each activity along a path of slices
+    periods = [[] for _ in range(nv)]
+    while path is not None:
+        chosen, t, path = path
+        for i in chosen:
+            periods[i].append(t)
+    return [sorted(ts) for ts in periods]
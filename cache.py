@@ -0,0 +1,71 @@
+'''Persistent on-disk cache of the bounds computed by lcalg.algorithm
+(selected arcs A, ES, LS and LB_2). Entries are keyed by a hash of the
+parsed instance data and lcalg.VERSION, so changing either invalidates them.
+Backed by SQLite so that several worker processes can share one cache.'''
+
+import os
+import json
+import sqlite3
+import hashlib
+
+CACHE_DIR = "./cache"
+
+
+class BoundsCache(object):
+
+    def __init__(self, directory=CACHE_DIR):
+        self.path = os.path.join(directory, "bounds.sqlite")
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS bounds "
+                        "(key TEXT PRIMARY KEY, value TEXT)")
+            con.execute("CREATE TABLE IF NOT EXISTS stats "
+                        "(name TEXT PRIMARY KEY, count INTEGER)")
+            con.executemany("INSERT OR IGNORE INTO stats VALUES (?, 0)",
+                            [("hits",), ("misses",)])
+
+    def _connect(self):
+        # connections are opened per call so the cache can be pickled and
+        # shared with pool workers
+        return sqlite3.connect(self.path, timeout=60)
+
+    @staticmethod
+    def key(data):
+        from lcalg import VERSION
+        raw = json.dumps(data, sort_keys=True) + VERSION
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, data):
+        '''Returns (A, ES, LS, LB_2) for the instance or None on a miss.'''
+        with self._connect() as con:
+            row = con.execute("SELECT value FROM bounds WHERE key = ?",
+                              (self.key(data),)).fetchone()
+            name = "misses" if row is None else "hits"
+            con.execute("UPDATE stats SET count = count + 1 WHERE name = ?",
+                        (name,))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        value = json.loads(row[0])
+        A = [tuple(arc) for arc in value['A']]
+        return A, value['ES'], value['LS'], value['LB_2']
+
+    def put(self, data, A, ES, LS, LB_2):
+        value = json.dumps({'A': A, 'ES': ES, 'LS': LS, 'LB_2': LB_2})
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO bounds VALUES (?, ?)",
+                        (self.key(data), value))
+
+    def stats(self):
+        '''Hits and misses of this process and over the cache lifetime.'''
+        with self._connect() as con:
+            total = dict(con.execute("SELECT name, count FROM stats"))
+            total['entries'] = con.execute(
+                "SELECT COUNT(*) FROM bounds").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses,
+                'total_hits': total['hits'],
+                'total_misses': total['misses'],
+                'entries': total['entries']}
@@ -0,0 +1,119 @@
+'''Packs a whole PSPLIB single-mode set into one binary file and loads it
+back through mmap, handing out zero-copy psplib.Instance views by (i, j).
+
+Layout (little endian):
+    header   magic 'PSPC', format version, number of instances, set name
+    table    one record per instance: i, j, n, T, K, #arcs, data offset
+    data     int32 blocks, per instance: durations (n), demands (n x K),
+             capacities (K), successor pointers (n + 1), successors (#arcs)
+
+Usage: python corpus.py j30 ./input/j30 ./input/j30.corpus'''
+
+import os
+import re
+import sys
+import glob
+import mmap
+import struct
+
+import numpy as np
+
+from psplib import Instance, read
+
+MAGIC = b'PSPC'
+FORMAT = 1
+HEADER = struct.Struct('<4sII16s')
+TABLE = np.dtype([('i', '<i4'), ('j', '<i4'), ('n', '<i4'), ('T', '<i4'),
+                  ('K', '<i4'), ('m', '<i4'), ('offset', '<i8')])
+
+
+def pack(name, directory, path):
+    '''Packs every '<name><i>_<j>.sm' file of directory into path.'''
+    pattern = re.compile(r'^%s(\d+)_(\d+)\.sm$' % re.escape(name))
+    files = []
+    for f in glob.glob(os.path.join(directory, '%s*_*.sm' % name)):
+        match = pattern.match(os.path.basename(f))
+        if match:
+            files.append((int(match.group(1)), int(match.group(2)), f))
+    files.sort()
+    table = np.zeros(len(files), dtype=TABLE)
+    blocks, offset = [], 0
+    for row, (i, j, f) in enumerate(files):
+        instance = read(f)
+        if len(instance.mode_durations) != instance.n:
+            raise ValueError('%s is not a single-mode instance' % f)
+        block = np.concatenate([instance.durations,
+                                instance.demands.ravel(),
+                                instance.capacities,
+                                instance.succ_ptr,
+                                instance.succ_idx]).astype('<i4')
+        table[row] = (i, j, instance.n, instance.T, instance.K,
+                      len(instance.succ_idx), offset)
+        blocks.append(block)
+        offset += len(block)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, len(files), name.encode()))
+        f.write(table.tobytes())
+        for block in blocks:
+            f.write(block.tobytes())
+    return len(files)
+
+
+class Corpus(object):
+    '''Read-only, memory-mapped view of a packed set. Pickling only carries
+    the path, so pool workers each map the same page-cached file.'''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, name = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != FORMAT:
+            raise ValueError('%s is not a packed PSPLIB corpus' % path)
+        self.name = name.rstrip(b'\0').decode()
+        self._table = np.frombuffer(self._mm, dtype=TABLE, count=count,
+                                    offset=HEADER.size)
+        self._data = np.frombuffer(
+            self._mm, dtype='<i4', offset=HEADER.size + self._table.nbytes)
+        self._index = dict(((int(row['i']), int(row['j'])), k)
+                           for k, row in enumerate(self._table))
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return sorted(self._index)
+
+    def __getitem__(self, key):
+        i, j = key
+        row = self._table[self._index[key]]
+        n, K, m = int(row['n']), int(row['K']), int(row['m'])
+        start = int(row['offset'])
+        durations, demands, capacities, succ_ptr, succ_idx = np.split(
+            self._data[start:start + n + n * K + K + n + 1 + m],
+            np.cumsum([n, n * K, K, n + 1]))
+        demands = demands.reshape(n, K)
+        return Instance(
+            name='%s%s_%s' % (self.name, i, j), n=n, T=int(row['T']), K=K,
+            durations=durations, demands=demands, capacities=capacities,
+            nonrenewable=self._data[:0], succ_ptr=succ_ptr,
+            succ_idx=succ_idx, mode_ptr=np.arange(n + 1, dtype=np.int32),
+            mode_durations=durations, mode_demands=demands)
+
+
+def main():
+    name, directory, path = sys.argv[1:4]
+    print('Packed %s instances into %s' % (pack(name, directory, path), path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+'''The event formulation of prcpsp.generate_constraints assembled as sparse
+arrays with NumPy: one column per variable and the constraint matrix in
+COO form, so that a solver can load the whole model in one call.
+Constraint numbers follow prcpsp.pdf.'''
+
+import collections
+
+import numpy as np
+
+
+BIGM = 1e5
+# optional changes of build that keep its optimum: big-M coefficients from
+# the instance instead of BIGM
+CUTS = ('bigm',)
+# families of O(n N^2) and O(|A| N) rows that rarely bind, left out of the
+# model and separated by the solver with build(..., lazy=True)
+LAZY = ('(46)', '(49)')
+
+
+class Rows(object):
+    '''Constraint rows in COO form: row k is
+    sum(val[rows == k] * x[cols[rows == k]]) <sense[k]> rhs[k], sense one
+    of '<', '>', '='.'''
+
+    def __init__(self):
+        self._rows, self._cols, self._vals = [], [], []
+        self.sense, self.rhs, self.row_names = [], [], []
+        self.num_rows = 0
+        self._coo = None
+
+    def add(self, family, keys, sense, rhs, *terms):
+        '''Appends one row per key. Each term is (row, col, val) with row
+        indexing into keys; arrays are broadcast against each other.'''
+        m = len(keys)
+        if m == 0:
+            return
+        for row, col, val in terms:
+            row, col, val = np.broadcast_arrays(row, col, val)
+            self._rows.append(self.num_rows + row.ravel())
+            self._cols.append(col.ravel())
+            self._vals.append(val.ravel().astype(float))
+        self.sense.extend(np.broadcast_to(sense, (m,)).tolist())
+        self.rhs.extend(np.broadcast_to(rhs, (m,)).astype(float).tolist())
+        # keys of a family all have the same length
+        name = '%s[%s]' % (family, ','.join(['%s'] * len(keys[0])))
+        self.row_names.extend([name % tuple(key) if key else family
+                               for key in keys])
+        self.num_rows += m
+        self._coo = None
+
+    def coo(self):
+        '''(rows, cols, vals), duplicate entries are to be summed.'''
+        if self._coo is None:
+            # an empty Rows is a matrix without entries
+            rows, cols, vals = (pieces or [np.zeros(0)] for pieces in
+                                (self._rows, self._cols, self._vals))
+            self._coo = (np.concatenate(rows).astype(np.int64),
+                         np.concatenate(cols).astype(np.int64),
+                         np.concatenate(vals).astype(float))
+            # the pieces are not kept twice
+            self._rows, self._cols, self._vals = [[part] for part in
+                                                  self._coo]
+        return self._coo
+
+    def residual(self, x):
+        '''Violation of each row by the column values x, at most 0 where
+        it holds.'''
+        rows, cols, vals = self.coo()
+        lhs = np.bincount(rows, weights=vals * x[cols],
+                          minlength=self.num_rows)
+        sense, rhs = np.array(self.sense), np.array(self.rhs)
+        return np.where(sense == '<', lhs - rhs,
+                        np.where(sense == '>', rhs - lhs, abs(lhs - rhs)))
+
+    def select(self, keep):
+        '''Rows keep (sorted row numbers) as new Rows.'''
+        rows, cols, vals = self.coo()
+        position = np.full(self.num_rows, -1)
+        position[keep] = np.arange(len(keep))
+        mask = position[rows] >= 0
+        selected = Rows()
+        selected._rows = [position[rows[mask]]]
+        selected._cols, selected._vals = [cols[mask]], [vals[mask]]
+        selected.sense = [self.sense[k] for k in keep]
+        selected.rhs = [self.rhs[k] for k in keep]
+        selected.row_names = [self.row_names[k] for k in keep]
+        selected.num_rows = len(keep)
+        return selected
+
+
+class EventModel(Rows):
+    '''Columns are z[i, e] (i in V, e = -1..N-3), a[i, e], t[e] and C_max,
+    with bounds lb/ub, objective obj, vtype ('B' or 'C') and names as
+    prcpsp has always named them, rows as in Rows. fixed counts the z and
+    a variables fixed outside the event windows and omitted the rows left
+    out per family. lazy holds the rows of the LAZY families when they are
+    left to the solver to separate, see build.'''
+
+    formulation = 'event'
+
+    def __init__(self, n, N, V, E):
+        Rows.__init__(self)
+        self.n, self.N, self.V, self.E = n, N, V, E
+        self.nv, self.M = len(V), len(E)
+        self.z_off = 0
+        self.a_off = self.nv * (N - 1)
+        self.t_off = self.a_off + self.nv * self.M
+        self.C_max = self.t_off + self.M
+        self.num_vars = self.C_max + 1
+        self.lb = np.zeros(self.num_vars)
+        self.ub = np.full(self.num_vars, np.inf)
+        self.obj = np.zeros(self.num_vars)
+        self.vtype = np.full(self.num_vars, 'C')
+        self.names = \
+            ['z[%s,%s]' % (i, e) for i in V for e in range(-1, N - 2)] + \
+            ['a[%s,%s]' % (i, e) for i in V for e in E] + \
+            ['t[%s]' % e for e in E] + ['C_max']
+        self.lazy = Rows()
+        self.fixed = collections.Counter()
+        self.omitted = collections.Counter()
+        self.cuts = collections.Counter()
+
+    def z(self, i, e):
+        return self.z_off + (np.asarray(i) - self.V[0]) * (self.N - 1) + \
+            np.asarray(e) + 1
+
+    def a(self, i, e):
+        return self.a_off + (np.asarray(i) - self.V[0]) * self.M + \
+            np.asarray(e)
+
+    def t(self, e):
+        return self.t_off + np.asarray(e)
+
+    def violation(self, x):
+        '''Largest violation of a bound, row (lazy ones included) or
+        integrality by the column values x, 0 for a feasible solution.'''
+        binary = self.vtype == 'B'
+        return max(self.residual(x).max(initial=0),
+                   self.lazy.residual(x).max(initial=0),
+                   (self.lb - x).max(), (x - self.ub).max(),
+                   abs(x[binary] - np.round(x[binary])).max(initial=0), 0)
+
+
+def extend(m, small, x):
+    '''Column values of m from a solution x of small, the model of the
+    same instance with fewer events: the extra events repeat the last one,
+    so activities in process at it stay so and nothing else changes.'''
+    extra = ((0, 0), (0, m.M - small.M))
+    z = np.round(x[:small.a_off]).reshape(small.nv, small.N - 1)
+    a = x[small.a_off:small.t_off].reshape(small.nv, small.M)
+    t = x[small.t_off:small.C_max]
+    return np.concatenate([np.pad(z, extra, 'edge').ravel(),
+                           np.pad(a, extra, 'edge').ravel(),
+                           np.pad(t, extra[1], 'edge'), [x[small.C_max]]])
+
+
+def build(n, N, T, K, p, p_minus, R, r, E, V, A, ES, LS, LB_2, window,
+          cuts=(), lazy=False):
+    '''EventModel of the formulation with activities restricted to their
+    event windows {i: (lo, hi)}, see prcpsp.event_windows. cuts names the
+    options of CUTS to use. With lazy the rows of
+    the LAZY families go to m.lazy instead of the model.'''
+    m = EventModel(n, N, V, E)
+    rare = m.lazy if lazy else m
+    if 'bigm' in cuts:
+        m.cuts['bigm'] = 0
+    L = E[-1]
+    M = len(E)
+    # no event comes after the latest completion of the project
+    LS_last = LS['%s' % n]
+
+    # variables
+    m.vtype[:m.a_off] = 'B'
+    m.ub[:m.a_off] = 1
+    m.ub[m.t_off:] = T
+    m.lb[m.C_max] = int(LB_2)
+    m.obj[m.C_max] = 1
+    events = np.array(E)
+    for i in V:
+        lo, hi = window[i]
+        # outside its window an activity is idle and a is constant
+        idle, before, after = \
+            (events < lo) | (events > hi), events < lo, events > hi
+        m.ub[m.z(i, events[idle])] = 0
+        m.ub[m.a(i, events[before])] = 0
+        m.lb[m.a(i, events[after])] = p[i]
+        m.ub[m.a(i, events[after])] = p[i]
+        m.fixed['z'] += idle.sum()
+        m.fixed['a'] += before.sum() + after.sum()
+
+    def _live(i):
+        # events e with z[i, e] or z[i, e - 1] free, e > 0
+        lo, hi = window[i]
+        return np.arange(max(lo, 1), min(hi + 1, L) + 1)
+
+    def _count(family, total, kept):
+        m.omitted[family] += total - kept
+
+    # (42) every activity is in process at some event
+    keys = [(i,) for i in V]
+    ii = np.array(V)[:, None]
+    m.add("(42)", keys, '>', 1,
+          (np.arange(len(keys))[:, None], m.z(ii, events[None, :]), 1))
+    m.add("(43)", [()], '=', 0, (0, m.t(L), 1), (0, m.C_max, -1))
+    m.add("(44)", [()], '=', 0, (0, m.t(0), 1))
+    ee = np.arange(L)
+    m.add("(45)", [(e,) for e in ee], '>', 0,
+          (np.arange(L), m.t(ee + 1), 1), (np.arange(L), m.t(ee), -1))
+
+    # (46) t[f] - t[e] >= p_minus[i] * ((z[i, e] - z[i, e - 1]) -
+    #                                   (z[i, f] - z[i, f - 1]) - 1)
+    for i in V:
+        live = _live(i)
+        e, f = np.triu_indices(len(live), 1)
+        e, f = live[e], live[f]
+        _count("(46)", L * (L - 1) // 2, len(e))
+        k = np.arange(len(e))
+        pm = p_minus[i]
+        rare.add("(46)", list(zip([i] * len(e), e.tolist(), f.tolist())),
+                 '>', -pm, (k, m.t(f), 1), (k, m.t(e), -1),
+                 (k, m.z(i, e), -pm), (k, m.z(i, e - 1), pm),
+                 (k, m.z(i, f), pm), (k, m.z(i, f - 1), -pm))
+
+    # (47) sum_{e_1 < e} z[i, e_1] - e * (1 - (z[i, e] - z[i, e - 1])) <= 0
+    # (48) sum_{e_1 >= e} z[i, e_1] -
+    #      (N - 2 - e) * (1 + (z[i, e] - z[i, e - 1])) <= 0
+    for i in V:
+        live = _live(i)
+        k = np.arange(len(live))
+        keys = [(i, e) for e in live.tolist()]
+        _count("(47)", L, len(live))
+        _count("(48)", L, len(live))
+        before = np.arange(M)[None, :] < live[:, None]
+        rows, cols = np.nonzero(before)
+        m.add("(47)", keys, '<', live, (rows, m.z(i, cols), 1),
+              (k, m.z(i, live), live), (k, m.z(i, live - 1), -live))
+        rows, cols = np.nonzero(~before)
+        m.add("(48)", keys, '<', M - live, (rows, m.z(i, cols), 1),
+              (k, m.z(i, live), -(M - live)),
+              (k, m.z(i, live - 1), M - live))
+
+    # (49) z[i, e] + sum_{e_1 <= e} z[j, e_1] - e * (1 - z[i, e]) <= 1
+    for (i, j) in A:
+        live = np.arange(window[j][0], window[i][1] + 1)
+        _count("(49)", M, len(live))
+        k = np.arange(len(live))
+        rows, cols = np.nonzero(np.arange(M)[None, :] <= live[:, None])
+        rare.add("(49)", [(i, j, e) for e in live.tolist()], '<',
+                 1 + live, (k, m.z(i, live), 1 + live),
+                 (rows, m.z(j, cols), 1))
+
+    # (50) resource capacities
+    demand = np.array([r[i] for i in V]).reshape(len(V), K)
+    keys = [(k, e) for k in range(K) for e in E]
+    rows, cols, vals = [], [], []
+    for k in range(K):
+        users = np.nonzero(demand[:, k])[0]
+        rows.append(np.repeat(k * M + np.arange(M), len(users)))
+        cols.append(m.z(np.array(V)[users][None, :],
+                        events[:, None]).ravel())
+        vals.append(np.tile(demand[users, k], M))
+    m.add("(50)", keys, '<', np.repeat(R[:K], M),
+          (np.concatenate(rows), np.concatenate(cols),
+           np.concatenate(vals)))
+
+    # (51) no activity is in process before the first event
+    m.add("(51)", [(i,) for i in V], '=', 0,
+          (np.arange(len(V)), m.z(np.array(V), -1), 1))
+
+    # (52.1) ES[i] * z[i, e] <= t[e]
+    # (52.2) LS[i] * (z[i, e] - z[i, e - 1]) +
+    #        LS[n] * (1 - (z[i, e] - z[i, e - 1])) >= t[e]
+    cut = set()
+    for i in V:
+        lo, hi = window[i]
+        active = np.arange(lo, hi + 1)
+        _count("(52.1)", M, len(active))
+        k = np.arange(len(active))
+        m.add("(52.1)", [(i, e) for e in active.tolist()], '<', 0,
+              (k, m.z(i, active), ES['%s' % i]), (k, m.t(active), -1))
+        live = np.arange(lo, min(hi + 1, L) + 1)
+        _count("(52.2)", M, len(live))
+        cut.update(e for e in E if not lo <= e <= hi + 1)
+        k = np.arange(len(live))
+        coef = LS['%s' % i] - LS_last
+        m.add("(52.2)", [(i, e) for e in live.tolist()], '>', -LS_last,
+              (k, m.z(i, live), coef), (k, m.z(i, live - 1), -coef),
+              (k, m.t(live), -1))
+    # what is left of (52.2) once z[i, e] and z[i, e - 1] are fixed
+    cut = np.array(sorted(cut), dtype=int)
+    m.add("(52.2)", [(e,) for e in cut.tolist()], '<', LS_last,
+          (np.arange(len(cut)), m.t(cut), 1))
+    m.add("(53.1)", [()], '>', ES['%s' % n], (0, m.C_max, 1))
+    m.add("(53.2)", [()], '<', LS['%s' % n], (0, m.C_max, 1))
+
+    # Preemption constraints
+    ii = np.array(V)
+    m.add("(1.2.5a)", [(i,) for i in V], '=', 0,
+          (np.arange(len(V)), m.a(ii, 0), 1))  # init
+    for i in V:
+        # a[i, e] - a[i, e - 1] is at most p[i] and t[e] - t[e - 1] at most
+        # the last time of (52.2)
+        M_c, M_d = (p[i], min(T, LS_last)) if 'bigm' in cuts else \
+            (BIGM, BIGM)
+        # rows over e > 0 as (variable, event shift, coefficient) terms
+        for family, sense, rhs, terms in [
+                ("(1.2.5b)", '<', 0, [('a', -1, 1), ('a', 0, -1)]),
+                ("(1.2.5c)", '<', 0, [('a', 0, 1), ('a', -1, -1),
+                                      ('z', 0, -M_c), ('z', -1, -M_c)]),
+                ("(1.2.5d)", '>', -M_d, [('a', 0, 1), ('a', -1, -1),
+                                         ('t', 0, -1), ('t', -1, 1),
+                                         ('z', 0, -M_d)]),
+                ("(1.2.5d)", '>', -M_d, [('a', 0, 1), ('a', -1, -1),
+                                         ('t', 0, -1), ('t', -1, 1),
+                                         ('z', -1, -M_d)])]:
+            live = _live(i)
+            _count(family, L, len(live))
+            k = np.arange(len(live))
+            cols = {'a': m.a(i, live), 'z': m.z(i, live), 't': m.t(live)}
+            m.add(family, [(i, e) for e in live.tolist()], sense, rhs,
+                  *[(k, cols[var] + shift, val)
+                    for var, shift, val in terms])
+    m.add("(1.2.5f)", [(i,) for i in V], '=', [p[i] for i in V],
+          (np.arange(len(V)), m.a(ii, L), 1))  # last
+    for i in V:
+        lo, hi = window[i]
+        live = np.arange(lo, min(hi + 1, L) + 1)
+        _count("(1.2.5g)", M, len(live))
+        m.add("(1.2.5g)", [(i, e) for e in live.tolist()], '<', p[i],
+              (np.arange(len(live)), m.a(i, live), 1))  # upper bound
+    return m
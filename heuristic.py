@@ -0,0 +1,124 @@
+'''List scheduling heuristic for a first incumbent of the event formulation.
+Activities, durations, demands and arcs are those of the model
+(prcpsp.get_constants), release dates come from the lcalg ES.
+
+In the event model an activity is in process at one run of consecutive
+events and is processed for at least the whole time in between, so a
+schedule with idle gaps inside an activity cannot be written as a solution.
+The heuristic is therefore a parallel schedule generation scheme without
+preemption; its schedules are preemptive schedules too and their makespan
+bounds the optimum from above.'''
+
+import numpy as np
+
+# priority rules, smaller first: latest start, minimum slack, earliest start
+RULES = {
+    'LST': lambda i, ES, LS: (LS['%s' % i], ES['%s' % i]),
+    'MSLK': lambda i, ES, LS: (LS['%s' % i] - ES['%s' % i], LS['%s' % i]),
+    'EST': lambda i, ES, LS: (ES['%s' % i], LS['%s' % i]),
+}
+
+
+def parallel_sgs(V, A, p, r, R, K, ES, priority):
+    '''Start times {i: S_i}. At every decision time the eligible activities
+    (predecessors finished, released by ES) are started in priority order
+    as long as the resources allow.'''
+    preds = dict((i, []) for i in V)
+    for (i, j) in A:
+        preds[j].append(i)
+    R = np.array(R[:K])
+    todo = sorted(V, key=priority)
+    start, finish = {}, {}
+    t = 0
+    while todo:
+        used = sum([np.array(r[i][:K]) for i in start
+                    if start[i] <= t < finish[i]], np.zeros(K))
+        started = True
+        while started:
+            # zero duration activities release their successors at once
+            started = False
+            for i in todo:
+                if ES['%s' % i] <= t and \
+                        all(finish.get(j, t + 1) <= t for j in preds[i]) and \
+                        np.all(used + r[i][:K] <= R):
+                    start[i], finish[i] = t, t + p[i]
+                    if p[i] > 0:
+                        used = used + r[i][:K]
+                    todo.remove(i)
+                    started = True
+                    break
+        later = [f for f in finish.values() if f > t] + \
+            [ES['%s' % i] for i in todo if ES['%s' % i] > t]
+        t = min(later) if later else t + 1
+    return start
+
+
+def schedules(V, A, p, r, R, K, ES, LS):
+    '''Start times of the parallel scheme under each priority rule.'''
+    return [parallel_sgs(V, A, p, r, R, K, ES,
+                         lambda i: RULES[rule](i, ES, LS))
+            for rule in sorted(RULES)]
+
+
+def event_times(S, p, p_minus):
+    '''Sorted event times for start times S. Events are put at every start
+    and finish and, where an activity has none inside, at its midpoint, so
+    that it is in process at the events strictly between its start and
+    finish (from event 0 when it starts at 0).'''
+    F = dict((i, S[i] + p[i]) for i in S)
+    points = set([0]) | set(S.values()) | set(F.values())
+    for i in sorted(S, key=S.get):
+        # (46) wants the first event in process p_minus before the finish
+        if p[i] > 0 and S[i] > 0 and not any(
+                S[i] < x < F[i] and x <= F[i] - p_minus[i] for x in points):
+            points.add(S[i] + p[i] / 2.)
+    # a zero duration activity sits between two events at the same time
+    return sorted(list(points) + [S[i] for i in S if p[i] == 0] * 2)
+
+
+def event_count(V, A, p, p_minus, r, R, K, ES, LS):
+    '''Number of events of the schedule with the shortest makespan over
+    the priority rules, the fewest on ties.'''
+    return min((max(S[i] + p[i] for i in S), len(event_times(S, p, p_minus)))
+               for S in schedules(V, A, p, r, R, K, ES, LS))[1]
+
+
+def event_solution(m, S, p, p_minus):
+    '''Column values of the EventModel m for start times S, None if the
+    schedule needs more events than m has, see event_times.'''
+    times = event_times(S, p, p_minus)
+    if len(times) > m.M:
+        return None
+    t = np.array(times + [times[-1]] * (m.M - len(times)), dtype=float)
+    x = np.zeros(m.num_vars)
+    x[m.t(np.arange(m.M))] = t
+    x[m.C_max] = t[-1]
+    for i in S:
+        if p[i] == 0:
+            s = np.searchsorted(t, S[i], 'left') + 1
+            f = s + 1
+        else:
+            s = 0 if S[i] == 0 else np.searchsorted(t, S[i], 'right')
+            f = np.searchsorted(t, S[i] + p[i], 'left')
+        x[m.z(i, np.arange(s, f))] = 1
+        x[m.a(i, np.arange(m.M))] = np.clip(t - S[i], 0, p[i])
+    return x
+
+
+def warm_start(m, A, p, p_minus, r, R, K, ES, LS, solution=None):
+    '''Best feasible column values of m over the priority rules, None if
+    no schedule fits the events of m, which is printed. solution(m, S)
+    gives the column values for start times S, event_solution by
+    default.'''
+    if solution is None:
+        def solution(m, S):
+            return event_solution(m, S, p, p_minus)
+    best = None
+    for S in schedules(m.V, A, p, r, R, K, ES, LS):
+        x = solution(m, S)
+        if x is not None and m.violation(x) < 1e-6 and \
+                (best is None or x[m.C_max] < best[m.C_max]):
+            best = x
+    if best is None:
+        print('Warm start: no list schedule is feasible in the model')
+    return best
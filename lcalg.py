@@ -1,130 +1,264 @@
 '''Code implementing the Local constraint propagation algorithm
 from Demassey et al. (2005) to get the earliest and latest start time bounds
-for the RCPSP. Uses PSPLIB j30 instances 1-10 parameter 1.
+for the RCPSP. Works on any PSPLIB single-mode set, j30 by default.
 Written by Jinran Zhan, 2017: jr.zhan07@gmail.com'''
 
 
-import re
-import itertools
-import collections
+import time
+
+import numpy as np
+
+from heuristic import schedules
+from psplib import Directory
+
+# Bump whenever a change to algorithm() alters its output, this invalidates
+# the entries of cache.BoundsCache
+VERSION = '7'
+
+
+def _closure(B):
+    '''Longest-path closure of B, Floyd-Warshall in the max-plus semiring.
+    Row and column 0 are left untouched.'''
+    b = B.copy()
+    sub = b[1:, 1:]
+    for k in range(sub.shape[0]):
+        np.maximum(sub, sub[:, k, None] + sub[None, k, :], out=sub)
+    return b
+
+
+def _add_arc(b, h, l, w):
+    '''Updates the closure b in place for a new arc h -> l of length w.
+    Only paths through the new arc can improve, so this is O(n^2).
+    Returns True if b changed.'''
+    if b[h, l] >= w:
+        return False
+    sub = b[1:, 1:]
+    np.maximum(sub, sub[:, h - 1, None] + w + sub[None, l - 1, :], out=sub)
+    return True
+
+
+def _comparable(n, A):
+    '''Boolean matrix, True where activities i and j are ordered by a path
+    of arcs in A, in either direction.'''
+    reach = np.zeros((n + 1, n + 1), dtype=bool)
+    for (i, j) in A:
+        reach[i, j] = True
+    for k in range(1, n + 1):
+        reach |= reach[:, k, None] & reach[None, k, :]
+    return reach | reach.T
+
+
+def _conflicts(r, R):
+    '''Pairs i < j and triples i < j < h of activities whose summed demand
+    exceeds the capacity of some resource, as arrays of activity numbers.'''
+    r, R = np.asarray(r, dtype=np.int32), np.asarray(R, dtype=np.int32)
+    n = len(r)
+    upper = np.triu(np.ones((n, n), dtype=bool), 1)
+    pairs = np.argwhere(upper & (r[:, None] + r[None, :] > R).any(axis=2))
+    triples = []
+    for i in range(n - 2):
+        mask = (r[i] + r[:, None] + r[None, :] > R).any(axis=2) & upper
+        mask[:i + 1] = False
+        j, h = np.nonzero(mask)
+        triples.append(np.column_stack([np.full(len(j), i), j, h]))
+    return pairs + 1, np.concatenate(triples).reshape(-1, 3) + 1
+
+
+def _maximum_cliques(n, edges):
+    '''All maximum cliques (of at least 2 activities) of the graph on 1..n
+    with the given edges, by Bron-Kerbosch with Tomita pivoting over int
+    bitsets. Returns sorted lists of activities.'''
+    adj = [0] * (n + 1)
+    for (i, j) in edges:
+        adj[i] |= 1 << j
+        adj[j] |= 1 << i
+
+    def _bits(x):
+        while x:
+            low = x & -x
+            yield low.bit_length() - 1
+            x ^= low
+
+    best, cliques = [2], []
+
+    def _expand(clique, size, P, X):
+        if not P and not X:
+            if size > best[0]:
+                best[0] = size
+                del cliques[:]
+            if size == best[0]:
+                cliques.append(sorted(_bits(clique)))
+            return
+        if size + bin(P).count('1') < best[0]:
+            return
+        # pivot on the vertex leaving the fewest candidates to branch on
+        u = max(_bits(P | X), key=lambda u: bin(P & adj[u]).count('1'))
+        for v in list(_bits(P & ~adj[u])):
+            _expand(clique | 1 << v, size + 1, P & adj[v], X & adj[v])
+            P &= ~(1 << v)
+            X |= 1 << v
+
+    _expand(0, 0, sum(1 << i for i in range(n + 1) if adj[i]), 0)
+    return cliques
+
+
+def _clique_bound(heads, p, tails):
+    '''Max over subsets Q of a clique of min head + sum p + min tail, in
+    O(k^2). Activities are swept by decreasing head, keeping for every tail
+    threshold the summed durations of those already swept that meet it.'''
+    heads, p, tails = (np.asarray(x, dtype=np.int64)
+                       for x in (heads, p, tails))
+    sums = np.full(len(heads), -2 ** 40, dtype=np.int64)  # empty subsets
+    best = -2 ** 40
+    for i in np.argsort(-heads, kind='stable'):
+        cover = tails <= tails[i]
+        sums[cover] = np.maximum(sums[cover], 0) + p[i]
+        best = max(best, int(heads[i] + (tails + sums).max()))
+    return best
+
+
+def _windows(b, p):
+    '''Earliest start ES and latest completion LC of activities 1..n in
+    the closure b, as arrays indexed by activity - 1.'''
+    ES = b[1, 1:].astype(np.int64)
+    LC = p - b[1:, 1].astype(np.int64)
+    return ES, LC
+
+
+def _timetable(ES, LC, p, r, R):
+    '''Preemptive timetabling. An activity without slack is processed in
+    every period of its window [ES, LC), the profile of these compulsory
+    parts leaves every other activity only the periods its demand fits in.
+    Returns the bounds (ES, LS, EC, LC) this implies: the first and last of
+    these periods bound the start and the completion, the p-th from either
+    end the latest start and the earliest completion. None if an activity
+    has fewer than p periods left.'''
+    busy = (p > 0) & (r > 0).any(axis=1)
+    fixed = busy & (LC - ES == p)
+    horizon = int(LC[busy].max(initial=0))
+    profile = np.zeros((horizon + 1, len(R)), dtype=np.int64)
+    np.add.at(profile, ES[fixed], r[fixed])
+    np.add.at(profile, LC[fixed], -r[fixed])
+    profile = np.cumsum(profile, axis=0)
+    es, ls, ec, lc = ES.copy(), LC - p, ES + p, LC.copy()
+    for i in np.nonzero(busy)[0]:
+        load = profile[ES[i]:LC[i]] - r[i] * fixed[i]
+        periods = ES[i] + np.nonzero((load + r[i] <= R).all(axis=1))[0]
+        if len(periods) < p[i]:
+            return None
+        es[i], lc[i] = periods[0], periods[-1] + 1
+        ls[i], ec[i] = periods[-p[i]], periods[p[i] - 1] + 1
+    return es, ls, ec, lc
+
+
+def _energetic(ES, LC, p, r, R):
+    '''Preemptive energetic reasoning over the intervals [t1, t2) between
+    an earliest start and a latest completion. Activity i works at least
+    p - max(0, t1 - ES) - max(0, LC - t2) in [t1, t2), the others leave it
+    room for at most q units there; the rest of p goes before t1, which
+    bounds its start, and after t2, which bounds its completion. Returns the
+    bounds (ES, LS, EC, LC), None if an interval is overloaded.'''
+    busy = (p > 0) & (r > 0).any(axis=1)
+    t1, t2 = np.meshgrid(np.unique(ES[busy]), np.unique(LC[busy]),
+                         indexing='ij')
+    inside = t1 < t2
+    t1, t2 = t1[inside][:, None], t2[inside][:, None]
+    before, after = np.maximum(t1 - ES, 0), np.maximum(LC - t2, 0)
+    work = np.maximum(p - before - after, 0) * busy
+    room = R * (t2 - t1) - work @ r
+    if (room < 0).any():
+        return None
+    # units of i that fit in [t1, t2) besides the work of the others
+    room = room[:, None, :] + work[:, :, None] * r
+    q = np.where(r > 0, room // np.maximum(r, 1), 2 ** 40).min(axis=2)
+    q = np.minimum(q, t2 - t1)
+    late = p - q - after
+    early = p - q - before
+    ls = np.where(late > 0, t1 - late, LC - p).min(axis=0, initial=2 ** 40)
+    ec = np.where(early > 0, t2 + early, ES + p).max(axis=0,
+                                                    initial=-2 ** 40)
+    return ES, np.minimum(ls, LC - p), np.maximum(ec, ES + p), LC
 
 
 def get_constants(data):
-    n = int(data['n'])  # n = 32,  dummy: 1 - 32
-    T = int(data['T'])  # T = 158
-    K = data['K']  # K = 4
-    p = data['p']  # len(p) = 32
-    R = data['R']  # len(R) = 4
-    r = data['r']  # len(r) = 32
-    E = range(n - 2)  # E = [0,...,29]
-    V = range(1, n + 1)  # V = [1,...,32]
+    n = int(data['n'])  # jobs, dummies 1 and n
+    T = int(data['T'])  # horizon
+    K = data['K']  # renewable resources
+    p = data['p']  # len(p) = n
+    R = data['R']  # len(R) = K
+    r = data['r']  # len(r) = n
+    E = range(n - 2)  # E = [0,...,n-3]
+    V = range(1, n + 1)  # V = [1,...,n]
     A = [item for sublist in data['A'] for item in sublist]
     return n, T, K, p, R, r, E, V, A
 
 
-def load_data(i, j):
-    f = open("./input/j30/j30%s_%s.sm" % (i, j), "r")
-    raw_lines = (f.read().splitlines())
-    data = {}
-    data['A'], data['p'], data['R'], data['r'] = [], [], [], []
-    line_counter = 0
+def load_data(i, j, corpus=None):
+    '''Instance (i, j) of corpus, a corpus.Corpus or psplib.Directory,
+    by default the j30 files.'''
+    if corpus is None:
+        corpus = Directory('j30')
+    return corpus[i, j].to_data()
 
-    for line in raw_lines:
-        # finds all the integers in a string
-        integer_list = list(map(int, re.findall(r'\d+', line)))
-        if len(integer_list) == 0:
-            continue
-        else:
-            if line_counter <= 17:
-                if 'jobs' in line:
-                    data['n'] = integer_list[0]
-                elif 'horizon' in line:
-                    data['T'] = integer_list[0]
-                elif '- renewable' in line:
-                    data['K'] = integer_list[0]
-                line_counter = line_counter + 1
-            # PRECEDENCE RELATIONS - 49 > ... > 18
-            elif int(data['n']) + 17 >= line_counter >= 18:
-                # integer_list[3:] = successors
-                if len(integer_list[3:]) >= 1:
-                    jobnr = integer_list[0]                  # jobnr.
-                    data['A'].append([(jobnr, successor)
-                                      for successor in integer_list[3:]])
-            # 82 > ... > 50
-            elif 2 * int(data['n']) + 18 >= line_counter > int(data['n']) + 18:
-                data['p'].append(integer_list[2])
-                data['r'].append(integer_list[3:])
-            line_counter = line_counter + 1
-        last_line = line_counter
-        if line_counter == last_line:
-            data['R'] = integer_list
-    f.close()
-    return data
-
-
-def algorithm(data):
+
+def algorithm(data, timings=None, tightening=None):
+    '''timings, if given a dict, gets the seconds spent in each stage:
+    conflicts, path consistency (the first closure included), immediate
+    selection, timetabling, energetic reasoning, symmetric triples, the
+    upper bound, edge finding and the destructive bound. tightening, if
+    given a dict, gets how much path consistency, timetabling, energetic
+    reasoning and the upper bound take off the summed windows LS - ES after
+    the first closure, and how much edge finding and the destructive bound
+    add to LB_2.
+
+    After the fixpoint over the horizon T the project is due by the
+    makespan of the best list schedule (heuristic.schedules), which no
+    optimal schedule exceeds, and timetabling and energetic reasoning,
+    which hold for preemptive schedules, run again under it before edge
+    finding and the destructive bound.'''
 
     def _initial_B(A, T):
-        B = [[0] * (n + 1) for i in range(n + 1)]  # 33 x 33
-        for i in V:
-            for j in V:
-                if i == j:
-                    B[i][j] = 0
-                elif (i, j) in A:
-                    B[i][j] = p[i - 1]
-                else:
-                    B[i][j] = -T
+        # 33 x 33, row and column 0 are unused
+        B = np.full((n + 1, n + 1), -T, dtype=np.int32)
+        B[0, :] = 0
+        B[:, 0] = 0
+        np.fill_diagonal(B, 0)
+        for (i, j) in A:
+            B[i, j] = p[i - 1]
         return B
 
-    def _get_F(n, A):
-        # Get minimial forbidden sets
-        if n == 2:  # of 2 activities
-            F = [[i, j] for i in V for j in V for k in range(K) if i < j and (
-                i, j) not in A and r[i - 1][k] + r[j - 1][k] > R[k]]
-        elif n == 3:  # of 3 activitites
-            F_3 = [[i, j, h] for i in V for j in V for h in V if i <
-                   j < h and ((i, j) or (j, h) or (i, h)) not in A]
-            F = [[i, j, h] for [i, j, h] in F_3 for k in range(
-                K) if r[i - 1][k] + r[j - 1][k] + r[h - 1][k] > R[k]]
+    def _get_F(size, A):
+        # Get forbidden sets, resource conflicting sets of activities that
+        # are not ordered by the arcs in A
+        if size == 2:  # of 2 activities, only direct arcs are excluded
+            arcs = set(A)
+            F = [[i, j] for (i, j) in F_2.tolist() if (i, j) not in arcs]
+        elif size == 3:  # of 3 activitites, no pair may be comparable
+            comp = _comparable(n, A)
+            i, j, h = F_3.T
+            F = F_3[~(comp[i, j] | comp[j, h] | comp[i, h])]
         return F
 
-    def _update_B(t, B, A_0, A):
-        b = _path_consistency(t - 1, B, A_0, A)
-        for (i, j) in A:
-            b[i][j] = p[i - 1]
-        return b
-
-    def _path_consistency(t, B, A_0, A):
-        if t == 1:
-            b = _initial_B(A_0, T)
-        if t > 1:
-            b = _update_B(t, B, A_0, A)
-        count = []
-        for i in V:
-            for l in V:
-                b[i][l] = max(B[i][j] + B[j][l] for j in V)
-                if b[i][l] != B[i][l]:
-                    count.append([i, l])
-        if len(count) == 1:  # if only one update
-            h, l = count[0], count[1]
-            for w in V:
-                for x in V:
-                    b[w][x] = max(B[w][x], B[w][h] + B[h][l] + B[l][x])
+    def _path_consistency(b, arcs):
+        # incremental: only re-propagate the arcs added since the last call
+        for (i, j) in arcs:
+            _add_arc(b, i, j, p[i - 1])
         return b
 
     def _immediate_selection(D, b, A):
-        E = [(i, j) for [i, j] in D if b[i][j] >=
-             1 - p[j - 1] and (i, j) not in A]
-        if len(E) != 0:
-            A = list(set(E + A))
-            return A, True
-        else:
-            return A, False
+        E = set((i, j) for [i, j] in D if b[i][j] >=
+                1 - p[j - 1] and (i, j) not in A)
+        return A + sorted(E), sorted(E)
 
     def _symmetric_triples(A, b, D):
-        F_3 = _get_F(3, A)
-        ST = [[i, j] for [i, j, k] in F_3 if b[k][i] >= 1 - p[i - 1] and
-              b[k][j] >= 1 - p[j - 1] and [i, j] not in D]
+        # k is in process together with both i and j, which then cannot
+        # overlap: k starts before either completes and completes after
+        # either starts
+        i, j, k = _get_F(3, A).T
+        hit = (b[k, i] >= 1 - p_[i - 1]) & (b[k, j] >= 1 - p_[j - 1]) & \
+            (b[i, k] >= 1 - p_[k - 1]) & (b[j, k] >= 1 - p_[k - 1])
+        ST = sorted(set(zip(i[hit].tolist(), j[hit].tolist())) -
+                    set(map(tuple, D)))
         if len(ST) != 0:
             print(len(ST))
             for [i, j] in ST:
@@ -133,152 +267,163 @@ def algorithm(data):
         else:
             return D, False
 
-    def _frequency(D):
-        f = dict(collections.Counter(list(itertools.chain.from_iterable(D))))
-        z = {}
-        for k in range(2, n + 1):
-            # key = activity, where freq. of key > k
-            z['%s' % k] = [key for key in f if f[key] >= k]
-            z['%s' % k].sort()
-            if len(z['%s' % k]) < k:
-                del z['%s' % k]
-        return z
-
-    def _find_cliques(potential_clique=[], remaining_nodes=[],
-                      skip_nodes=[], depth=0):
-
-        if len(remaining_nodes) == 0 and len(skip_nodes) == 0:
-            C.append(potential_clique)
-            return
-
-        for node in remaining_nodes:
-            new_potential_clique = potential_clique + [node]
-            new_remaining_nodes = [
-                n for n in remaining_nodes if n in node.neighbors]
-            new_skip_list = [n for n in skip_nodes if n in node.neighbors]
-            _find_cliques(new_potential_clique, new_remaining_nodes,
-                          new_skip_list, depth + 1)
-
-            remaining_nodes.remove(node)
-            skip_nodes.append(node)
-        return C
-
-    def _get_nodes(V, D):
-        class Node(object):
-
-            def __init__(self, name):
-                self.name = name
-                self.neighbors = []
+    def _width(b):
+        # summed windows LS - ES
+        return -int(b[1, 1:].sum() + b[1:, 1].sum())
 
-            def __repr__(self):
-                return self.name
+    def _tightened(stage, gain):
+        if tightening is not None:
+            tightening[stage] = tightening.get(stage, 0) + gain
 
-        namespace = globals()
+    def _apply(b, es, ls, ec, lc):
+        # bounds (ES, LS, EC, LC) of activity - 1 as arcs from and to
+        # activity 1: a start bounds the latest completion of the
+        # predecessors, a completion the earliest start of the successors
+        changed = False
         for i in V:
-            namespace['N_%d' % i] = Node('%s' % i)
-        for i in V:
-            namespace['N_%d' % i].neighbors = \
-                [namespace['N_%d' % item[1]] for item in D if item[0] == i] +\
-                [namespace['N_%d' % item[0]] for item in D if item[1] == i]
-        return
-
-    def _get_clique(D):
-        cliques = []
-        _get_nodes(V, D)
-        namespace = globals()
-        z = _frequency(D)
-        max_length_clique = int(max(z.keys()))
-        for num in range(max_length_clique, 1, -1):
-            clique = _find_cliques(
-                remaining_nodes=[namespace['N_%d' % i] for i in z['%s' % num]])
-            cliques.append(clique)
-        return cliques
-
-    def _subsets(C):
-        # find subsets
-        subsets = set()
-        for m in range(2, len(C) + 1):
-            subsets.update(set(itertools.combinations(C, m)))
-        return subsets
+            if p_[i - 1] > 0:
+                changed |= _add_arc(b, 1, i, int(es[i - 1]))
+                changed |= _add_arc(b, i, 1, int(p_[i - 1] - lc[i - 1]))
+        for (i, j) in A:
+            changed |= _add_arc(b, 1, j, int(ec[i - 1]))
+            changed |= _add_arc(b, i, 1, int(p_[i - 1] - ls[j - 1]))
+        return changed
+
+    def _resources(b, f):
+        # None if f finds the windows of b infeasible, else whether its
+        # bounds changed b
+        bounds = f(*_windows(b, p_) + (p_, r_, R_))
+        if bounds is None:
+            return None
+        changed = _apply(b, *bounds)
+        return None if (np.diagonal(b)[1:] > 0).any() else changed
+
+    def _resource_stage(b, stage, f):
+        width = _width(b)
+        changed = _timed(stage, _resources, b, f)
+        _tightened(stage, width - _width(b))
+        return changed
+
+    def _destructive(b):
+        # raises b[1][n] while timetabling and energetic reasoning refute
+        # C_max <= b[1][n], up to the horizon
+        while b[1][n] < -b[n][1]:
+            trial = b.copy()
+            _add_arc(trial, n, 1, -int(b[1][n]))
+            while True:
+                changed = _resources(trial, _timetable)
+                if changed is False:
+                    changed = _resources(trial, _energetic)
+                if not changed:
+                    break
+            if changed is not None:
+                return
+            b[1][n] += 1
+
+    def _upper_bound(b):
+        # shortest list schedule under the windows of the first closure,
+        # activities numbered like V
+        ES = dict(('%s' % j, int(b[1][j])) for j in V)
+        LS = dict(('%s' % i, -int(b[i][1])) for i in V)
+        p_1, r_1 = [0] + list(p), [[0] * K] + list(r)
+        return min(max(S[i] + p_1[i] for i in S)
+                   for S in schedules(V, A, p_1, r_1, R, K, ES, LS))
 
     def _get_last(clique, b):
-        sub_cliques = _subsets(clique)
-        # print(sub_cliques)
-        d = {}
-        for Q in sub_cliques:
-            b[1][n] = max(b[1][n], min(b[1][i] for i in Q) +
-                          sum(p[i - 1]
-                              for i in Q) + min(b[i][n] for i in Q))
-            d['%s' % (str(Q))] = b[1][n]
-        return d
-
-    def _edge_finding():
-        cliques = list(itertools.chain.from_iterable(_get_clique(D)))
-        cliques_max = [item for item in cliques if len(
-            item) == max(len(item) for item in cliques)]
-        clique_max = []
-        for item in cliques_max:
-            item = [int(str(item[i])) for i in range(len(item))]
-            item.sort()
-            if item not in clique_max:
-                clique_max.append(item)
-
-        last = []
-        for C in clique_max:
-            b = _path_consistency(it - 1, B, A_0, A)
-            last.append(_get_last(C, b))
-
-        m = []
-        for item in last:
-            m.append(min(item.values()))
-            b[1][n] = min(item.values())
-        # b[1][n] = min(m)
+        Q = np.array(clique)
+        return _clique_bound(b[1, Q], p_[Q - 1], b[Q, n] - p_[Q - 1])
+
+    def _edge_finding(b):
+        # C_max lower bound from the maximum cliques of D
+        for C in _maximum_cliques(n, D):
+            b[1][n] = max(b[1][n], _get_last(C, b))
+
+    def _bounds(b):
         print('b[1][n]: %s' % b[1][n])  # C_max lb: 382
 
         # earliest starting time
         b_1_j, b_i_1 = {}, {}
         for j in V:
-            b_1_j['%s' % j] = b[1][j]
+            b_1_j['%s' % j] = int(b[1][j])
         # print('ES: %s' % )
         ES = b_1_j
 
         # latest starting time
         for i in V:
-            b_i_1['%s' % i] = -b[i][1]
+            b_i_1['%s' % i] = -int(b[i][1])
         # print('LS: %s' % )
         LS = b_i_1
-        LB_2 = b[1][n]
+        LB_2 = int(b[1][n])
         return ES, LS, LB_2
 
+    def _timed(stage, f, *args):
+        start = time.time()
+        result = f(*args)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0) + time.time() - start
+        return result
+
     n, T, K, p, R, r, E, V, A = get_constants(data)
+    p_ = np.array(p, dtype=np.int32)
+    r_ = np.array(r, dtype=np.int64).reshape(n, K)
+    R_ = np.array(R, dtype=np.int64)
+    F_2, F_3 = _timed('conflicts', _conflicts, r, R)
     # INIT
-    A_0 = A  # A: 48
-    C = []
-    B = _initial_B(A_0, T)
+    A_0 = A
     D = _get_F(2, A_0)
-    b = _path_consistency(1, B, A_0, A)  # 940 updates
-    A, update = _immediate_selection(D, b, A_0)  # yes# A: 50
-    B = _update_B(2, B, A_0, A)
+    # one full closure, later iterations only propagate the new arcs
+    b = _timed('path_consistency', _closure, _initial_B(A_0, T))
 
-    # Iteration 2 onwards apply local constraint programming alg
-    it = 2
+    # apply local constraint programming alg until no more deductions
     while True:
-        b = _path_consistency(it, B, A_0, A)
-        A, update = _immediate_selection(D, b, A)
-        if update:
-            B = _update_B(it + 1, B, A_0, A)
+        A, arcs = _timed('immediate_selection', _immediate_selection, D, b, A)
+        if arcs:
+            width = _width(b)
+            b = _timed('path_consistency', _path_consistency, b, arcs)
+            _tightened('path_consistency', width - _width(b))
+        elif _resource_stage(b, 'timetabling', _timetable) or \
+                _resource_stage(b, 'energetic', _energetic):
+            continue
         else:
-            D, update = _symmetric_triples(A, b, D)
+            D, update = _timed('symmetric_triples', _symmetric_triples, A, b,
+                               D)
             if not update:
                 break
-        it += 1
-    ES, LS, LB_2 = _edge_finding()
+    # immediate selection and symmetric triples order activities as if they
+    # were not preempted, only the preemptive stages see the upper bound
+    UB = _timed('upper_bound', _upper_bound, b)
+    width = _width(b)
+    _add_arc(b, n, 1, -UB)
+    _tightened('upper_bound', width - _width(b))
+    while _resource_stage(b, 'timetabling', _timetable) or \
+            _resource_stage(b, 'energetic', _energetic):
+        pass
+    for stage, f in (('edge_finding', _edge_finding),
+                     ('destructive', _destructive)):
+        LB = int(b[1][n])
+        _timed(stage, f, b)
+        _tightened(stage, int(b[1][n]) - LB)
+    ES, LS, LB_2 = _bounds(b)
     return n, T, K, p, R, r, E, V, A, ES, LS, LB_2
 
 
-def process(i=1, j=1):
-    data = load_data(i, j)
-    n, T, K, p, R, r, E, V, A, ES, LS, LB_2 = algorithm(data)
+def process(i=1, j=1, cache=None, corpus=None, timings=None):
+    '''timings, if given a dict, gets the seconds spent parsing and in
+    propagation (or in the cache lookup) as 'parse' and 'propagation'.'''
+    start = time.time()
+    data = load_data(i, j, corpus)
+    parsed = time.time()
+    bounds = cache.get(data) if cache is not None else None
+    if bounds is None:
+        n, T, K, p, R, r, E, V, A, ES, LS, LB_2 = algorithm(data)
+        if cache is not None:
+            cache.put(data, A, ES, LS, LB_2)
+    else:
+        n, T, K, p, R, r, E, V, _ = get_constants(data)
+        A, ES, LS, LB_2 = bounds
+    if timings is not None:
+        timings['parse'] = parsed - start
+        timings['propagation'] = time.time() - parsed
     return n, T, K, p, R, r, E, V, A, ES, LS, LB_2
 
 
@@ -286,5 +431,5 @@ def main():
     process()
 
 
-if __name__ == main():
+if __name__ == '__main__':
     main()
@@ -0,0 +1,179 @@
+'''Portfolio mode: several configurations race on one instance, each in
+its own thread with its own model and solver. The formulations model
+different problems (see prcpsp.FORMULATIONS), so the best makespan found
+and the best lower bound proven are shared per formulation; the list
+schedules of the heuristic hold in every formulation and count for each.
+Once the two meet for a formulation it is solved and its members are
+interrupted. The best makespan of a formulation is also the cutoff of its
+members (see Portfolio.incumbent), and its schedule is handed to those
+whose model has the same columns. The winner is the member holding the
+best makespan over all formulations.
+
+A configuration overrides options of prcpsp.generate_constraints (the
+formulation, cuts, event count, backend, ...) and sets solver parameters
+per backend. Bounds of a model with fewer events than the formulation
+needs are not bounds of the instance, such members do not prove.'''
+
+import collections
+import threading
+
+from backends import EPS, OPTIMAL
+
+# backends whose schedules are feasible in every formulation, and the key
+# they share under
+GENERAL = ('heuristic',)
+ANY = '*'
+
+Config = collections.namedtuple('Config', 'name options params proves')
+Config.__doc__ = '''options override those of the sweep, params maps a
+backend key to its parameters, proves whether the bounds of the member
+hold for the instance.'''
+
+CONFIGS = [
+    Config('event', {}, {}, True),
+    Config('event-bigm', {'cuts': ('bigm',), 'prune': True}, {}, True),
+    Config('event-tight', {'events': 'tight'}, {}, False),
+    Config('event-feasibility', {},
+           {'gurobi': {'MIPFocus': 1},
+            'highs': {'mip_heuristic_effort': 0.3}}, True),
+    Config('time', {'formulation': 'time'}, {}, True),
+    Config('bnb', {'formulation': 'time', 'backend': 'bnb'}, {}, True),
+    Config('heuristic', {'backend': 'heuristic'}, {}, False),
+]
+
+
+def configs(names='all'):
+    '''The CONFIGS named in a comma separated list, all of them for
+    'all'.'''
+    if names == 'all':
+        return list(CONFIGS)
+    by_name = dict((config.name, config) for config in CONFIGS)
+    chosen = [name for name in names.split(',') if name]
+    unknown = [name for name in chosen if name not in by_name]
+    if unknown:
+        raise ValueError('unknown portfolio configurations %s, of %s' %
+                         (', '.join(unknown), ', '.join(sorted(by_name))))
+    return [by_name[name] for name in chosen]
+
+
+class Portfolio(object):
+    '''Shared state of the members (backends.Backend) racing on one
+    instance. objective, bound, winner and values map a formulation (ANY
+    for the GENERAL members) to its best makespan, the best lower bound of
+    a member that proves, the member holding the makespan and the column
+    values of its schedule (None if not reported); decided holds the
+    formulations where they met.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.members = []
+        self._proving = set()
+        # members with the same columns
+        self._columns = {}
+        self.objective, self.bound, self.winner = {}, {}, {}
+        self.values = {}
+        self.decided = set()
+
+    @staticmethod
+    def _formulation(solver):
+        return ANY if solver.key in GENERAL else solver.m.formulation
+
+    def _best(self, f):
+        # best makespan of formulation f and its member, GENERAL
+        # schedules included
+        found = [(self.objective[g], self.winner[g]) for g in (f, ANY)
+                 if g in self.objective]
+        return min(found, key=lambda x: x[0]) if found else (None, None)
+
+    def _met(self, f):
+        objective = self._best(f)[0]
+        bounds = [self.bound[g] for g in (f, ANY) if g in self.bound]
+        return objective is not None and bounds and \
+            objective <= max(bounds) + EPS
+
+    def join(self, solver, config):
+        '''Adds a loaded solver, whose model's lower bound of C_max holds
+        for the instance. Returns False if its formulation is already
+        solved.'''
+        m = solver.m
+        solver.portfolio, solver.config = self, config.name
+        f = self._formulation(solver)
+        columns = (m.num_vars, hash(tuple(m.names)))
+        with self._lock:
+            self.members.append(solver)
+            self._columns[solver] = columns
+            if config.proves:
+                self._proving.add(solver)
+            if f in self.decided:
+                return False
+        self.report(solver, None, m.lb[m.C_max], proven=True)
+        with self._lock:
+            return f not in self.decided
+
+    def report(self, solver, objective, bound, proven=None, values=None):
+        '''A member found a schedule of makespan objective, with column
+        values values if given, or proved the lower bound bound, either may
+        be None. Its bound counts if it proves, or if proven.'''
+        with self._lock:
+            f = self._formulation(solver)
+            if proven is None:
+                proven = solver in self._proving
+            if objective is not None and \
+                    (f not in self.objective or
+                     objective < self.objective[f] - EPS):
+                self.objective[f], self.winner[f] = objective, solver
+                self.values[f] = values
+            if bound is not None and proven and \
+                    (f not in self.bound or bound > self.bound[f]):
+                self.bound[f] = bound
+            open_ = set(self._formulation(member)
+                        for member in self.members) - self.decided - \
+                set([ANY])
+            solved = set(g for g in open_ if self._met(g))
+            self.decided |= solved
+            others = [member for member in self.members
+                      if member is not solver and
+                      self._formulation(member) in solved]
+        for member in others:
+            member.interrupt()
+
+    def incumbent(self, solver):
+        '''The best makespan of the formulation of a member, GENERAL
+        schedules included, and the column values of its schedule if they
+        are of the same columns as the member's model (else None); (None,
+        None) without one. No schedule of the member worse than it is of
+        any use.'''
+        with self._lock:
+            f = self._formulation(solver)
+            objective, winner = self._best(f)
+            if objective is None:
+                return None, None
+            values = self.values[self._formulation(winner)]
+            if winner is solver or \
+                    self._columns[winner] != self._columns[solver]:
+                values = None
+            return objective, values
+
+    def finished(self, solver):
+        '''Final report of a member: an optimal status proves its
+        objective when the member proves, or when the objective meets the
+        lower bound of its model anyway.'''
+        m = solver.m
+        with self._lock:
+            proves = solver in self._proving
+        proves = proves or (solver.objective is not None and
+                            solver.objective <= m.lb[m.C_max] + EPS)
+        optimal = solver.status == OPTIMAL and proves
+        self.report(solver, solver.objective,
+                    solver.objective if optimal else solver.bound,
+                    proven=optimal or None)
+
+    def best(self):
+        '''The member with the best makespan over all formulations, of a
+        solved formulation on ties, the first one to join without any.'''
+        with self._lock:
+            if not self.objective:
+                return self.members[0] if self.members else None
+            f = min(self.objective, key=lambda f: (
+                self.objective[f], f not in self.decided))
+            return self.winner[f]
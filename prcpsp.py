@@ -2,11 +2,47 @@
 constrained scheduling problem.
 Written by David Torres Sanchez, 2019: d.torressanchez@lancaster.ac.uk'''
 
+import os
+import math
 import time
-import gurobipy as grb
+import queue
+import argparse
+import threading
+import multiprocessing
 
+from backends import BACKENDS, EPS, INFEASIBLE, OPTIMAL
+from cache import CACHE_DIR, BoundsCache
+from corpus import Corpus
+from psplib import Directory
+from eventmodel import CUTS, build, extend
+from results import RESULTS_DB, ResultsStore
+import heuristic
+import portfolio
+import timemodel
 
-def get_constants(i, j):
+# outputs per instance set, e.g. ./output/j30_results.txt
+RESULTS = "./output/%s_results.txt"
+SOLUTION = "./output/%s_solution%s_%s.sol"
+INFEASIBLE_MODEL = "./output/%s_model%s_%s%s"
+TIME_LIMIT = 5 * 60
+# time for each feasibility problem of the destructive lower bound
+FEASIBILITY_LIMIT = 30
+TASKS_PER_WORKER = 10
+# formulations of prepare, auto picks one per instance. They model
+# different problems (the event model restricts preemption, the
+# time-indexed one preempts at any period), so their optima differ and
+# every result records the formulation it comes from
+FORMULATIONS = ('event', 'time', 'auto')
+
+
+def get_constants(i, j, cache=None, corpus=None, events=None,
+                  timings=None):
+    '''events: None for the event count of the formulation, 'tight' for
+    the events the best list schedule needs (heuristic.event_count) when
+    fewer, which leaves at least that schedule feasible. Nothing bounds the
+    events an optimal schedule needs by that count, so the tight model
+    may miss every optimal one; see finish for how it is used. timings is
+    passed on to lcalg.process.'''
     def _floor(x, y):
         try:
             return floor(x / y)
@@ -16,140 +52,533 @@ def get_constants(i, j):
     from lcalg import process
     from math import floor
     start = time.time()
-    n, T, K, p, R, r, E, V, A, ES, LS, LB_2 = process(i, j)
+    n, T, K, p, R, r, E, V, A, ES, LS, LB_2 = process(i, j, cache, corpus,
+                                                      timings)
     duration = time.time() - start
     A_new = []
     for (i, j) in [item for item in A]:
         if i != 1 and j != n:
             A_new.append((i, j))
     V = range(1, n)
+    # durations and demands by job number, like V, A, ES and LS
+    p, r = [0] + list(p), [[0] * K] + list(r)
     p_minus = [min(dur, floor(dur / 2)) for dur in p]
     N = int(sum([_floor(p[k], p_minus[k]) for k in range(len(p))]))
+    if events == 'tight':
+        N = min(N, heuristic.event_count(V, A_new, p, p_minus, r, R, K,
+                                         ES, LS) + 2)
     # Updated number of events for preemptions
     E = range(N - 2)
     return n, N, T, K, p, p_minus, R, r, E, V, A_new, ES, LS, LB_2, duration
 
 
-def generate_constraints(i, j):
-
-    def _create_variables():
-        z = model.addVars([(i, e) for i in V for e in range(-1, N - 2)],
-                          name="z", vtype="B")
-        a = model.addVars([(i, e) for i in V for e in E], name="a",
-                          vtype="C", lb=0.0)
-        t = model.addVars([e for e in E], name="t", vtype="C",
-                          lb=0.0, ub=T)
-        C_max = model.addVar(name="C_max", vtype="C", lb=int(LB_2),
-                             ub=T, obj=1)
-        model.update()
-        return z, a, t, C_max
-
-    def _add_oee_constraints():
-        model.addConstrs((grb.quicksum(z[i, e] for e in E) >= 1 for i in V),
-                         name="(42)")
-        model.addConstr(t[E[-1]] == C_max, name="(43)")
-
-        model.addConstr(t[0] == 0, name="(44)")
-
-        model.addConstrs(
-            (t[e + 1] - t[e] >= 0 for e in E if e != N - 3), name="(45)")
-
-        model.addConstrs((p[i] >= t[f] - t[e] >=
-                          p_minus[i] * ((z[i, e] - z[i, e - 1]) -
-                                        (z[i, f] - z[i, f - 1]) - 1)
-                          for i in V
-                          for e in E
-                          for f in range(e + 1, len(E)) if e > 0 and f > 0),
-                         name="(46)")
-        model.addConstrs((grb.quicksum(z[i, e_1] for e_1 in range(e)) -
-                          (e * (1 - (z[i, e] - z[i, e - 1]))) <= 0
-                          for i in V for e in E if e != 0), name="(47)")
-        model.addConstrs((grb.quicksum(z[i, e_1] for e_1 in range(e, N - 2)) -
-                          ((N - 2 - e) * (1 + (z[i, e] - z[i, e - 1]))) <= 0
-                          for i in V for e in E if e != 0), name="(48)")
-        model.addConstrs((z[i, e] +
-                          grb.quicksum(z[j, e_1] for e_1 in range(e + 1)) -
-                          (e * (1 - z[i, e])) <= 1
-                          for (i, j) in A for e in E), name="(49)")
-        model.addConstrs((grb.quicksum(r[i][k] * z[i, e] for i in V) <= R[k]
-                          for k in range(K)
-                          for e in E), name="(50)")
-        model.addConstrs((z[i, -1] == 0 for i in V), name="(51)")
-        model.addConstrs((ES['%s' % i] * z[i, e] <= t[e]
-                          for i in V for e in E), name="(52.1)")
-        model.addConstrs((LS['%s' % i] * (z[i, e] - z[i, e - 1]) +
-                          LS['%s' % (n - 1)] * (1 - (z[i, e] - z[i, e - 1])) >=
-                          t[e] for i in V for e in E), name="(52.2)")
-        model.addConstr(ES['%s' % n], "<=", rhs=C_max, name="(53.1)")
-        model.addConstr(LS['%s' % n], ">=", rhs=C_max, name="(53.2)")
-        return
+def event_windows(V, A, E, ES):
+    '''Range of events (lo, hi) at which each activity can be in process.
+    By (49) every event of a predecessor comes before every event of its
+    successor and by (42) each activity takes at least one event, so an
+    activity with a chain of m predecessors (successors) cannot be active
+    at the first (last) m events. By (44) and (52.1), ES > 0 excludes
+    event 0.'''
+    succs = dict((i, []) for i in V)
+    preds = dict((i, []) for i in V)
+    for (i, j) in A:
+        succs[i].append(j)
+        preds[j].append(i)
 
-    def _add_preemption_constraints():
-        # Preemption constraints
-        BIGM = 1e5
-        model.addConstrs((a[i, 0] == 0 for i in V), name="(1.2.5a)")  # init
-        model.addConstrs((a[i, e - 1] <= a[i, e] for i in V
-                          for e in E if e != 0),
-                         name="(1.2.5b)")
-        model.addConstrs((a[i, e] <= a[i, e - 1] +
-                          BIGM * (z[i, e] + z[i, e - 1])
-                          for i in V for e in E if e != 0),
-                         name="(1.2.5c)")
-        model.addConstrs((a[i, e] >= a[i, e - 1] + (t[e] - t[e - 1]) -
-                          BIGM * (1 - z[i, e])
-                          for i in V for e in E if e != 0),
-                         name="(1.2.5d)")
-        model.addConstrs((a[i, e] >= a[i, e - 1] + (t[e] - t[e - 1]) -
-                          BIGM * (1 - z[i, e - 1])
-                          for i in V for e in E if e != 0),
-                         name="(1.2.5d)")
-        model.addConstrs((a[i, E[-1]] == p[i]
-                          for i in V), name="(1.2.5f)")  # last
-        model.addConstrs((a[i, e] <= p[i] for i in V for e in E),
-                         name="(1.2.5g)")  # upper bound
-        model.update()
-        return
+    def _chain(i, nexts, memo):
+        if i not in memo:
+            memo[i] = max([_chain(j, nexts, memo) + 1 for j in nexts[i]] +
+                          [0])
+        return memo[i]
+
+    before, after = {}, {}
+    return dict((i, (max(_chain(i, preds, before), int(ES['%s' % i] > 0)),
+                     E[-1] - _chain(i, succs, after))) for i in V)
+
+
+def choose_formulation(n, N, K, p, r, V, ES, LS):
+    '''Formulation with the smaller estimated model: the time-indexed one
+    grows with the horizon through the window widths (timemodel.size), the
+    event one with N^2 per activity, the entries of (46) to (48). The two
+    have different optima, compare results of the same formulation only.'''
+    window = timemodel.windows(V, p, ES, LS, LS['%s' % n])
+    return 'time' if timemodel.size(V, K, p, r, window) < 3 * len(V) * N ** 2 \
+        else 'event'
 
-    model = grb.Model("Linear Program %s, %s" % (i, j))
-    model.setParam('TimeLimit', 5 * 60)
+
+def prepare(i, j, cache=None, corpus=None, prune=False, warm_start=True,
+            events=None, solution=None, timings=None, cuts=(), lazy=False,
+            formulation='event'):
+    '''Parse, bounds and build stages, solver independent: returns the
+    eventmodel.EventModel of instance (i, j), start values x (None without
+    one), the last event, the preprocessing and the build time. cuts are
+    the options of eventmodel.CUTS to use, with lazy the
+    eventmodel.LAZY families are left to the solver to separate.
+    formulation is one of FORMULATIONS, with 'time' the model is a
+    timemodel.TimeModel instead and prune, events, solution, cuts and lazy
+    do not apply.'''
     # load constants
     n, N, T, K, p, p_minus, R, r, E, V, A, ES, LS, LB_2, duration_prec = \
-        get_constants(i, j)
-    # Create variables
-    z, a, t, C_max = _create_variables()
-    # Constraints
-    _add_oee_constraints()
-    _add_preemption_constraints()
-    return model, E[-1], duration_prec
+        get_constants(i, j, cache, corpus, events, timings)
+    if formulation == 'auto':
+        formulation = choose_formulation(n, N, K, p, r, V, ES, LS)
+    if formulation == 'time':
+        start = time.time()
+        m = timemodel.build(n, K, p, R, r, V, A, ES, LS, LB_2)
+        x = None
+        if warm_start:
+            x = heuristic.warm_start(
+                m, A, p, p_minus, r, R, K, ES, LS,
+                lambda m, S: timemodel.schedule_solution(m, S, p))
+        if x is not None:
+            m.ub[m.C_max] = min(m.ub[m.C_max], x[m.C_max])
+            print('Warm start: C_max <= %s' % x[m.C_max])
+        print('Time-indexed: %s periods, %s columns' % (m.M, m.num_vars))
+        return m, x, E[-1], duration_prec, time.time() - start
+    start = time.time()
+    # Event windows, without pruning every activity may use every event
+    if prune:
+        window = event_windows(V, A, E, ES)
+    else:
+        window = dict((i, (0, E[-1])) for i in V)
+    # Variables and constraints as sparse arrays, loaded in one call each
+    m = build(n, N, T, K, p, p_minus, R, r, E, V, A, ES, LS, LB_2, window,
+              cuts, lazy)
+    # Incumbent from list scheduling or from the solution start of a model
+    # with fewer events (a solved backend), its makespan bounds C_max
+    x = None
+    if solution is not None and solution.values is not None:
+        x = extend(m, solution.m, solution.values)
+        if m.violation(x) > 1e-6:
+            x = None
+    if x is None and warm_start:
+        x = heuristic.warm_start(m, A, p, p_minus, r, R, K, ES, LS)
+    if x is not None:
+        m.ub[m.C_max] = min(m.ub[m.C_max], x[m.C_max])
+    if prune:
+        print('Event windows: fixed %s z and %s a variables, omitted %s '
+              'constraints %s' % (m.fixed['z'], m.fixed['a'],
+                                  sum(m.omitted.values()), dict(m.omitted)))
+    if cuts:
+        print('Cuts: %s rows %s' % (sum(m.cuts.values()), dict(m.cuts)))
+    if lazy:
+        print('Lazy: %s of %s rows left out' %
+              (m.lazy.num_rows, m.lazy.num_rows + m.num_rows))
+    if x is not None:
+        print('Warm start: C_max <= %s' % x[m.C_max])
+    return m, x, E[-1], duration_prec, time.time() - start
+
 
+def load(m, x, i, j, backend='gurobi', threads=None):
+    # solver stage, the model goes into the solver with its start values
+    solver = BACKENDS[backend](m, "Linear Program %s, %s" % (i, j),
+                               time_limit=TIME_LIMIT, threads=threads)
+    if x is not None:
+        solver.set_start(x)
+    return solver
 
-def optimise(model, i, j, duration_prec):
+
+def generate_constraints(i, j, threads=None, cache=None, corpus=None,
+                         prune=False, backend='gurobi', warm_start=True,
+                         events=None, solution=None, timings=None, cuts=(),
+                         lazy=False, formulation='event'):
+    m, x, last, duration_prec, duration_build = prepare(
+        i, j, cache, corpus, prune, warm_start, events, solution, timings,
+        cuts, lazy, formulation)
     start = time.time()
-    model.optimize()
-    runtime = time.time() - start
-    if model.getAttr("Status") == 3:  # Infeasible
-        model.computeIIS()
-        model.write("./output/model%s_%s.ilp" % (i, j))
+    solver = load(m, x, i, j, backend, threads)
+    duration_build += time.time() - start
+    if timings is not None:
+        timings['build'] = timings.get('build', 0) + duration_build
+    return solver, last, duration_prec, duration_build
+
+
+def deepen(solver, limit=TIME_LIMIT, step=FEASIBILITY_LIMIT):
+    '''Destructive lower bound: C_max <= c for c = LB, LB + 1, ... below
+    the incumbent, each solved as a feasibility problem (the search stops
+    at the first solution) for at most step seconds. Every infeasible c
+    raises the lower bound; once one is feasible or undecided the model is
+    solved over the remaining range, from the best solution found. limit
+    is the time over all solves.'''
+    m = solver.m
+    lb, ub = m.lb[m.C_max], m.ub[m.C_max]
+    c = math.ceil(lb - EPS)
+    while c < ub - EPS and (solver.runtime or 0) + step < limit:
+        solver.set_bounds(m.C_max, lb, c)
+        solver.set_time_limit(step)
+        solver.optimize(stop=c)
+        if solver.status == INFEASIBLE:
+            print('C_max > %s' % c)
+            lb, c = c, c + 1
+            continue
+        if solver.status == OPTIMAL and solver.objective is not None:
+            return
+        if solver.objective is not None:
+            ub = solver.objective
+        break
+    solver.set_bounds(m.C_max, lb, ub)
+    start = solver.values if solver.values is not None else solver.start
+    if start is not None:
+        solver.set_start(start)
+    solver.set_time_limit(max(limit - (solver.runtime or 0), 1))
+    solver.optimize(stop=lb)
+
+
+def search(solver, destructive=False):
+    '''Solves, ending as soon as the incumbent meets the lower bound of
+    C_max, after the destructive lower bound loop if destructive.'''
+    if destructive:
+        deepen(solver)
+    else:
+        solver.optimize(stop=solver.m.lb[solver.m.C_max])
+
+
+def optimise(solver, i, j, duration_prec, duration_build=0, store=None,
+             timings=None, name='j30', destructive=False):
+    start = time.time()
+    search(solver, destructive)
+    record(solver, i, j, time.time() - start, duration_prec, duration_build,
+           store, timings, name)
+
+
+def record(solver, i, j, runtime, duration_prec, duration_build=0,
+           store=None, timings=None, name='j30'):
+    '''Writes the solution (or infeasible subsystem) and appends the result
+    to the results file of instance set name and, if given, the
+    results.ResultsStore.'''
+    if solver.lazy:
+        print('Lazy: %s rows separated %s' %
+              (sum(solver.lazy.values()), dict(solver.lazy)))
+    if store is not None:
+        timings = dict(timings or {}, solve=runtime)
+        store.put(i, j, solver, timings, name)
+    if solver.status == INFEASIBLE:
+        solver.write_infeasible(INFEASIBLE_MODEL %
+                                (name, i, j, solver.infeasible_ext))
         return
     else:
-        model.write("./output/solution%s_%s.sol" % (i, j))
-        file_out = open("./output/j30_results.txt", "a")
-        file_out.write('%s \t %s \t %s \t %s \t %s \t %s \n ' %
-                       (i, j, model.objVal, runtime,
-                        model.Runtime, duration_prec))
+        solver.write_solution(SOLUTION % (name, i, j))
+        file_out = open(RESULTS % name, "a")
+        file_out.write('%s \t %s \t %s \t %s \t %s \t %s \t %s \t %s \n ' %
+                       (i, j, solver.objective, runtime,
+                        solver.runtime, duration_prec, duration_build,
+                        solver.m.formulation))
         file_out.close()
         return
-        # t_last = model.getVarByName("t[%s]" % last)
-        # print t_last.x
-        # raw_input()
+
+
+def expected_effort(i, j, corpus=None):
+    '''Cheap estimate of how hard instance (i, j) is to solve, the number of
+    rows in constraint (46), computed from the raw data only.'''
+    from lcalg import load_data
+    from math import floor
+    data = load_data(i, j, corpus)
+    n = int(data['n'])
+    N = sum(dur // floor(dur / 2) for dur in data['p'] if dur >= 2)
+    return n * N ** 2
+
+
+def set_name(corpus=None):
+    # instance set of a corpus.Corpus or psplib.Directory, j30 without
+    return corpus.name if corpus is not None else 'j30'
+
+
+def solved_instances(path=RESULTS % 'j30'):
+    # instances already recorded in the results file
+    if not os.path.exists(path):
+        return set()
+    with open(path) as file_in:
+        return set((int(row[0]), int(row[1]))
+                   for row in (line.split() for line in file_in)
+                   if len(row) >= 2)
+
+
+def _build_options(options):
+    # options of generate_constraints, the rest are for the solve stage
+    return dict((key, value) for key, value in options.items()
+                if key not in ('destructive', 'portfolio'))
+
+
+def finish(solver, i, j, duration_prec, duration_build, options, store=None,
+           timings=None):
+    '''Solve and record stages, the solver is disposed of afterwards. With
+    tight events the model only proves optimality when its optimum meets
+    the lower bound of C_max. Otherwise it is built again with every event
+    and solved from the solution found, and the time of that second build
+    and solve is recorded separately as the 'resolve' phase.'''
+    name = set_name(options.get('corpus'))
+    if options.get('events') != 'tight' or \
+            solver.m.formulation != 'event':
+        optimise(solver, i, j, duration_prec, duration_build, store, timings,
+                 name, options.get('destructive', False))
+        solver.dispose()
+        return
+    start = time.time()
+    # with fewer events an infeasible makespan proves nothing, the
+    # destructive loop waits for every event
+    search(solver)
+    runtime = time.time() - start
+    m = solver.m
+    if solver.status != OPTIMAL or \
+            solver.objective > m.lb[m.C_max] + EPS:
+        # Optimal with fewer events only proves optimality at the lower
+        # bound, solve again with every event starting from this solution
+        print('Solving %s_%s again with every event' % (i, j))
+        first = solver
+        solver, last, again, duration = generate_constraints(
+            i, j, timings=timings,
+            **dict(_build_options(options), events=None, solution=first))
+        first.dispose()
+        duration_build += duration
+        start = time.time()
+        search(solver, options.get('destructive', False))
+        runtime += time.time() - start
+        timings = dict(timings or {},
+                       resolve=again + duration + time.time() - start)
+    record(solver, i, j, runtime, duration_prec, duration_build, store,
+           timings, name)
+    solver.dispose()
+
+
+def race(i, j, configs, store=None, **options):
+    '''Portfolio mode: the configurations configs (portfolio.Config) race
+    on instance (i, j), each in a thread with its own model and solver,
+    until one proves optimality or all are done. Only the winner is
+    recorded, with the name of its configuration.'''
+    name = set_name(options.get('corpus'))
+    shared = portfolio.Portfolio()
+    members, errors = {}, []
+    start = time.time()
+
+    def _member(config):
+        try:
+            timings = {}
+            member = dict(_build_options(options), **config.options)
+            backend = member.pop('backend', 'gurobi')
+            threads = member.pop('threads', None)
+            m, x, last, duration_prec, duration_build = prepare(
+                i, j, timings=timings, **member)
+            begin = time.time()
+            solver = load(m, x, i, j, backend, threads)
+            solver.set_params(config.params.get(backend, {}))
+            duration_build += time.time() - begin
+            timings['build'] = duration_build
+            members[config.name] = (solver, timings, duration_prec,
+                                    duration_build)
+            if shared.join(solver, config):
+                search(solver, options.get('destructive', False) and
+                       config.proves)
+                shared.finished(solver)
+        except Exception as error:
+            errors.append(error)
+
+    runners = [threading.Thread(target=_member, args=(config,), daemon=True)
+               for config in configs]
+    for runner in runners:
+        runner.start()
+    for runner in runners:
+        runner.join()
+    if errors:
+        raise errors[0]
+    winner = shared.best()
+    for config in configs:
+        solver = members[config.name][0]
+        print('Portfolio %s_%s %s: %s %s' % (i, j, config.name,
+                                             solver.status or 'not run',
+                                             solver.objective))
+    print('Portfolio %s_%s won by %s' % (i, j, winner.config))
+    _, timings, duration_prec, duration_build = members[winner.config]
+    record(winner, i, j, time.time() - start, duration_prec,
+           duration_build, store, timings, name)
+    for solver, _, _, _ in members.values():
+        solver.dispose()
+
+
+def solve(args):
+    i, j, options, store = args
+    if options.get('portfolio'):
+        race(i, j, options['portfolio'], store, **options)
+        return i, j
+    timings = {}
+    solver, last, duration_prec, duration_build = generate_constraints(
+        i, j, timings=timings, **_build_options(options))
+    finish(solver, i, j, duration_prec, duration_build, options, store,
+           timings)
+    return i, j
+
+
+def stream(instances, store=None, prefetch=2, **options):
+    '''Solves instances one after the other, yielding each (i, j) once
+    recorded, while a thread parses, propagates and builds the models of
+    the next ones. At most prefetch prepared models wait at any time, the
+    thread blocks until the solver catches up.'''
+    stages = dict((key, options[key]) for key in
+                  ('cache', 'corpus', 'prune', 'warm_start', 'events',
+                   'cuts', 'lazy', 'formulation')
+                  if key in options)
+    prepared = queue.Queue(maxsize=prefetch)
+
+    def _produce():
+        try:
+            for i, j in instances:
+                timings = {}
+                prepared.put((i, j, timings,
+                              prepare(i, j, timings=timings, **stages)))
+        except Exception as error:
+            prepared.put(error)
+        else:
+            prepared.put(None)
+
+    producer = threading.Thread(target=_produce, daemon=True)
+    producer.start()
+    while True:
+        job = prepared.get()
+        if job is None:
+            break
+        if isinstance(job, Exception):
+            raise job
+        i, j, timings, (m, x, last, duration_prec, duration_build) = job
+        del job
+        start = time.time()
+        solver = load(m, x, i, j, options.get('backend', 'gurobi'),
+                      options.get('threads'))
+        del m, x
+        duration_build += time.time() - start
+        timings['build'] = duration_build
+        finish(solver, i, j, duration_prec, duration_build, options, store,
+               timings)
+        del solver
+        yield i, j
+    producer.join()
+
+
+def batch(instances, workers=None, store=None, **options):
+    '''Solves instances [(i, j), ...] on a process pool, hardest first,
+    skipping the ones already in the results file or in store. Results also
+    go to store (a results.ResultsStore shared by the workers). options are
+    passed on to generate_constraints: threads, cache (a cache.BoundsCache
+    shared by the workers) and corpus (a corpus.Corpus or psplib.Directory
+    to read instances from, j30 by default).'''
+    threads = options.setdefault('threads', 1)
+    cache, corpus = options.get('cache'), options.get('corpus')
+    if workers is None:
+        # a portfolio runs a solver per configuration
+        workers = max(1, (os.cpu_count() or 1) //
+                      (threads * len(options.get('portfolio') or [None])))
+    results = RESULTS % set_name(corpus)
+    os.makedirs(os.path.dirname(results), exist_ok=True)
+    done = solved_instances(results)
+    if store is not None:
+        # infeasible instances are only in the store
+        done |= store.solved(set_name(corpus))
+    todo = sorted((inst for inst in instances if inst not in done),
+                  key=lambda inst: -expected_effort(inst[0], inst[1], corpus))
+    print('%s instances to solve, %s already solved' %
+          (len(todo), len(instances) - len(todo)))
+    if workers == 1 and options.get('portfolio'):
+        for inst in todo:
+            print('Solved %s_%s' % solve(inst + (options, store)))
+    elif workers == 1:
+        for i, j in stream(todo, store, **options):
+            print('Solved %s_%s' % (i, j))
+    else:
+        # workers are replaced now and then, so that whatever the solvers
+        # leave behind does not pile up over a sweep
+        with multiprocessing.Pool(workers,
+                                  maxtasksperchild=TASKS_PER_WORKER) as pool:
+            for i, j in pool.imap_unordered(
+                    solve, [inst + (options, store) for inst in todo]):
+                print('Solved %s_%s' % (i, j))
+    if cache is not None:
+        print('Bounds cache: %s' % cache.stats())
 
 
 def main():
-    for i in range(1, 49):
-        for j in range(1, 11):
-            model, last, duration_prec = generate_constraints(i, j)
-            optimise(model, i, j, duration_prec)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes '
+                             '(default: cores // threads)')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='solver threads per instance')
+    parser.add_argument('--cache', default=CACHE_DIR,
+                        help='directory of the lcalg bounds cache')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always rerun lcalg preprocessing')
+    parser.add_argument('--results', default=RESULTS_DB,
+                        help='SQLite store of results and phase timings')
+    parser.add_argument('--set', default='j30',
+                        help='PSPLIB single-mode set: j30, j60, j90, j120')
+    parser.add_argument('--pattern', default=None,
+                        help='instance files of the set with %%s for the '
+                             'parameter and the instance (default: '
+                             './input/SET/SET%%s_%%s.sm)')
+    parser.add_argument('--corpus', default=None,
+                        help='packed instance set made by corpus.py, '
+                             'instead of the files')
+    parser.add_argument('--prune', action='store_true',
+                        help='fix variables and omit constraints outside '
+                             'the event windows of each activity')
+    parser.add_argument('--no-warm-start', action='store_true',
+                        help='do not start from the list scheduling '
+                             'heuristic')
+    parser.add_argument('--tight-events', action='store_true',
+                        help='solve first with the events of the list '
+                             'schedule, again with all if not proven '
+                             'optimal')
+    parser.add_argument('--destructive', action='store_true',
+                        help='first decide C_max <= LB, LB + 1, ... as '
+                             'feasibility problems')
+    parser.add_argument('--cuts', default='',
+                        help='comma separated optional changes of the event '
+                             'model, of %s'
+                             % ', '.join(CUTS))
+    parser.add_argument('--lazy', action='store_true',
+                        help='leave constraints (46) and (49) out of the '
+                             'model, Gurobi adds the violated ones')
+    parser.add_argument('--formulation', choices=FORMULATIONS,
+                        default='event',
+                        help='event model, time-indexed model or the '
+                             'smaller of the two per instance; their optima '
+                             'differ, the formulation is recorded with '
+                             'every result')
+    parser.add_argument('--portfolio', default=None,
+                        help='race the comma separated configurations of '
+                             'portfolio.CONFIGS (or all) on each instance')
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        default='gurobi',
+                        help='MIP solver, or bnb for the branch and bound '
+                             'of bnb.py on the time-indexed formulation')
+    args = parser.parse_args()
+    cuts = tuple(cut for cut in args.cuts.split(',') if cut)
+    for cut in cuts:
+        if cut not in CUTS:
+            parser.error('unknown cut family %s' % cut)
+    if args.lazy and args.backend != 'gurobi':
+        # HiGHS has no lazy constraint callback, bnb and the heuristic do
+        # not read the rows
+        parser.error('--lazy needs the gurobi backend')
+    # the branch and bound searches schedules of the time-indexed model
+    formulation = 'time' if args.backend == 'bnb' else args.formulation
+    try:
+        configs = portfolio.configs(args.portfolio) if args.portfolio \
+            else None
+    except ValueError as error:
+        parser.error(str(error))
+    cache = None if args.no_cache else BoundsCache(args.cache)
+    if args.corpus:
+        corpus = Corpus(args.corpus)
+    else:
+        corpus = Directory(args.set, args.pattern)
+    instances = corpus.keys()
+    os.makedirs(os.path.dirname(args.results) or '.', exist_ok=True)
+    store = ResultsStore(args.results)
+    batch(instances, args.workers, store, threads=args.threads, cache=cache,
+          corpus=corpus, prune=args.prune, backend=args.backend,
+          warm_start=not args.no_warm_start,
+          events='tight' if args.tight_events else None,
+          destructive=args.destructive, cuts=cuts, lazy=args.lazy,
+          formulation=formulation, portfolio=configs)
 
 
-if __name__ == main():
+if __name__ == '__main__':
     main()
@@ -1,47 +1,15 @@
-import gurobipy as grb
-model = grb.Model("Linear Programming")
-import re
 import itertools
 import collections
+from psplib import read
 
 
 ## data ##
-f = open("j301_1.txt", "r")
-raw_lines  = (f.read().splitlines())
-data = {}
-data['A'], data['p'], data['R'], data['r'] = [], [], [], []      
-line_counter = 0
-
-for line in raw_lines:
-    integer_list = list(map(int, re.findall(r'\d+', line))) # finds all the integers in a string
-    if len(integer_list) == 0:
-        continue
-    else:
-        if line_counter <= 17:
-            if 'jobs' in line:
-                data['n'] = integer_list[0]    
-            elif 'horizon' in line:
-                data['T'] = integer_list[0]    
-            elif '- renewable' in line:
-                data['K'] = integer_list[0]    
-            line_counter = line_counter + 1
-        elif int(data['n']) + 17 >= line_counter >= 18:  # PRECEDENCE RELATIONS - 49 > ... > 18
-            if len(integer_list[3:]) >= 1:               # integer_list[3:] = successors
-                jobnr = integer_list[0]                  # jobnr.
-                data['A'].append([(jobnr, successor) for successor in integer_list[3:]])
-        elif 2*int(data['n']) + 18 >= line_counter > int(data['n']) + 18:                     # 82 > ... > 50
-            data['p'].append(integer_list[2])  
-            data['r'].append(integer_list[3:])
-        line_counter = line_counter + 1
-    last_line = line_counter
-    if line_counter == last_line:
-        data['R'] = integer_list  
+data = read("j301_1.txt").to_data()
 print(data)
-f.close()
 
 
 ## Parameters ##  
-def get_constants(model):
+def get_constants(data):
     n = int(data['n'])          ## n = 32,  dummy: 1 - 32
     T = int(data['T'])          ## T = 158
     K = data['K']               ## K = 4
@@ -52,7 +20,7 @@ def get_constants(model):
     V = [v for v in range(1,n+1)] ## V = [1,...,32]
     A = [item for sublist in data['A'] for item in sublist]
     return n, T, K, p, R, r, E, V, A
-n, T, K, p, R, r, E, V, A = get_constants(model)
+n, T, K, p, R, r, E, V, A = get_constants(data)
 
 """""""""""""""
 initialisation
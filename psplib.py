@@ -0,0 +1,162 @@
+'''Single pass parser for PSPLIB instance files (.sm single-mode j30, j60,
+j90, j120 and .mm multi-mode), reading each file section by section into a
+compact array backed Instance.'''
+
+import glob
+import os
+import re
+
+import numpy as np
+
+
+class Instance(object):
+    '''A PSPLIB project. Jobs are numbered 1..n in the file and stored
+    0-based here. durations and demands hold mode 1 and the renewable
+    resources only, as used by lcalg and prcpsp; every mode of job i is in
+    rows mode_ptr[i]:mode_ptr[i + 1] of mode_durations / mode_demands,
+    whose columns are the renewable then the nonrenewable resources.
+    Successors of job i are succ_idx[succ_ptr[i]:succ_ptr[i + 1]] (CSR).'''
+
+    __slots__ = ('name', 'n', 'T', 'K', 'durations', 'demands',
+                 'capacities', 'nonrenewable', 'succ_ptr', 'succ_idx',
+                 'mode_ptr', 'mode_durations', 'mode_demands')
+
+    def __init__(self, name, n, T, K, durations, demands, capacities,
+                 nonrenewable, succ_ptr, succ_idx, mode_ptr, mode_durations,
+                 mode_demands):
+        self.name = name
+        self.n = n
+        self.T = T
+        self.K = K
+        self.durations = durations
+        self.demands = demands
+        self.capacities = capacities
+        self.nonrenewable = nonrenewable
+        self.succ_ptr = succ_ptr
+        self.succ_idx = succ_idx
+        self.mode_ptr = mode_ptr
+        self.mode_durations = mode_durations
+        self.mode_demands = mode_demands
+
+    def __repr__(self):
+        return 'Instance(%s, n=%s, T=%s, K=%s)' % (
+            self.name, self.n, self.T, self.K)
+
+    def successors(self, i):
+        return self.succ_idx[self.succ_ptr[i]:self.succ_ptr[i + 1]]
+
+    def modes(self, i):
+        return self.mode_ptr[i + 1] - self.mode_ptr[i]
+
+    def arcs(self):
+        '''Precedence arcs (i, j) with 1-based job numbers.'''
+        return [(i + 1, int(j) + 1) for i in range(self.n)
+                for j in self.successors(i)]
+
+    def to_data(self):
+        '''The dict of plain lists used by lcalg.algorithm.'''
+        return {'n': self.n, 'T': self.T, 'K': self.K,
+                'p': self.durations.tolist(),
+                'r': self.demands.tolist(),
+                'R': self.capacities.tolist(),
+                'A': [[(i + 1, int(j) + 1) for j in self.successors(i)]
+                      for i in range(self.n) if len(self.successors(i))]}
+
+
+def _ints(line):
+    return [int(token) for token in line.split()]
+
+
+def read(path):
+    n = T = 0
+    counts = {'R': 0, 'N': 0, 'D': 0}
+    successors, modes, capacities = [], [], []
+    section = None
+    with open(path) as f:
+        for line in f:
+            if line.startswith('*'):
+                section = None
+                continue
+            if section is None:
+                if line.startswith('PRECEDENCE RELATIONS'):
+                    section = 'precedence'
+                elif line.startswith('REQUESTS/DURATIONS'):
+                    section = 'requests'
+                elif line.startswith('RESOURCEAVAILABILITIES'):
+                    section = 'availabilities'
+                elif ':' in line:
+                    key, value = line.split(':', 1)
+                    value = value.split()
+                    if key.startswith('jobs'):
+                        n = int(value[0])
+                    elif key.startswith('horizon'):
+                        T = int(value[0])
+                    elif key.strip().startswith('-') and len(value) == 2:
+                        counts[value[1]] = int(value[0])
+                continue
+            tokens = line.split()
+            if not tokens or not tokens[0].isdigit():
+                continue  # column titles and separators
+            if section == 'precedence':
+                # jobnr. #modes #successors successors
+                successors.append([int(x) - 1 for x in tokens[3:]])
+            elif section == 'requests':
+                row = _ints(line)
+                resources = counts['R'] + counts['N'] + counts['D']
+                if len(row) == resources + 3:  # jobnr. mode duration ...
+                    modes.append([row[2:]])
+                else:  # further mode of the previous job
+                    modes[-1].append(row[1:])
+            elif section == 'availabilities':
+                capacities = _ints(line)
+
+    K = counts['R']
+    succ_ptr = np.zeros(n + 1, dtype=np.int32)
+    succ_ptr[1:] = np.cumsum([len(s) for s in successors])
+    succ_idx = np.array([j for s in successors for j in s], dtype=np.int32)
+    mode_ptr = np.zeros(n + 1, dtype=np.int32)
+    mode_ptr[1:] = np.cumsum([len(m) for m in modes])
+    rows = np.array([row for m in modes for row in m], dtype=np.int32)
+    first = rows[mode_ptr[:-1]]
+    return Instance(
+        name=os.path.splitext(os.path.basename(path))[0], n=n, T=T, K=K,
+        durations=first[:, 0].copy(),
+        demands=first[:, 1:K + 1].copy(),
+        capacities=np.array(capacities[:K], dtype=np.int32),
+        nonrenewable=np.array(capacities[K:], dtype=np.int32),
+        succ_ptr=succ_ptr, succ_idx=succ_idx, mode_ptr=mode_ptr,
+        mode_durations=rows[:, 0].copy(), mode_demands=rows[:, 1:].copy())
+
+
+def read_set(pattern):
+    '''Reads every file matching pattern, e.g. "./input/j30/*.sm", into a
+    dict {name: Instance}.'''
+    return dict((instance.name, instance) for instance in
+                (read(path) for path in sorted(glob.glob(pattern))))
+
+
+class Directory(object):
+    '''The instance files of a set, indexed by (parameter, instance) like a
+    corpus.Corpus. pattern holds two %s for them, by default the PSPLIB
+    layout './input/<name>/<name>%s_%s.sm'.'''
+
+    def __init__(self, name='j30', pattern=None):
+        self.name = name
+        self.pattern = pattern or './input/%s/%s%%s_%%s.sm' % (name, name)
+
+    def __getitem__(self, key):
+        return read(self.pattern % key)
+
+    def __contains__(self, key):
+        return os.path.exists(self.pattern % key)
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        match = re.compile('^%s$' % re.escape(self.pattern).replace(
+            re.escape('%s'), r'(\d+)')).match
+        return sorted((int(found.group(1)), int(found.group(2)))
+                      for found in map(match,
+                                       glob.glob(self.pattern % ('*', '*')))
+                      if found)
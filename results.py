@@ -0,0 +1,94 @@
+'''Structured store of solve results, one row per solved instance with the
+solver outcome, the model size and the time spent in each phase of the
+pipeline:
+
+    parse        reading the instance
+    propagation  lcalg (or the bounds cache lookup)
+    build        assembling and loading the model, warm start included
+    solve        the solver, wall clock
+    resolve      of build and solve, the second model of --tight-events
+                 with every event (None when the first one was enough)
+
+Backed by SQLite so that several worker processes can write to one store.'''
+
+import json
+import sqlite3
+import time
+
+RESULTS_DB = "./output/results.sqlite"
+
+COLUMNS = [('instance_set', 'TEXT'), ('i', 'INTEGER'), ('j', 'INTEGER'),
+           ('backend', 'TEXT'), ('formulation', 'TEXT'), ('portfolio', 'TEXT'),
+           ('status', 'TEXT'), ('objective', 'REAL'), ('bound', 'REAL'),
+           ('gap', 'REAL'), ('nodes', 'INTEGER'), ('variables', 'INTEGER'),
+           ('constraints', 'INTEGER'), ('nonzeros', 'INTEGER'),
+           ('events', 'INTEGER'), ('parse', 'REAL'), ('propagation', 'REAL'),
+           ('build', 'REAL'), ('solve', 'REAL'), ('resolve', 'REAL'),
+           ('solver_runtime', 'REAL'),
+           ('trajectory', 'TEXT'), ('cuts', 'TEXT'), ('lazy', 'INTEGER'),
+           ('finished', 'REAL')]
+
+
+class ResultsStore(object):
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        with self._connect() as con:
+            # readers do not block the writing workers
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("CREATE TABLE IF NOT EXISTS results (%s)" %
+                        ', '.join('%s %s' % column for column in COLUMNS))
+            # stores made before a column was added
+            present = set(row[1] for row in
+                          con.execute("PRAGMA table_info(results)"))
+            for column in COLUMNS:
+                if column[0] not in present:
+                    con.execute("ALTER TABLE results ADD COLUMN %s %s" %
+                                column)
+
+    def _connect(self):
+        # connections are opened per call so the store can be pickled and
+        # shared with pool workers
+        return sqlite3.connect(self.path, timeout=60)
+
+    def put(self, i, j, solver, timings, instance_set='j30'):
+        '''Records a solved backends.Backend; timings holds the seconds of
+        each phase by name.'''
+        m = solver.m
+        row = {'instance_set': instance_set, 'i': i, 'j': j,
+               'backend': solver.key,
+               'formulation': m.formulation, 'portfolio': solver.config,
+               'status': solver.status,
+               'objective': solver.objective, 'bound': solver.bound,
+               'gap': solver.gap, 'nodes': solver.nodes,
+               'variables': m.num_vars, 'constraints': m.num_rows,
+               'nonzeros': solver.nnz, 'events': m.M,
+               'solver_runtime': solver.runtime,
+               'trajectory': json.dumps(solver.trajectory),
+               'cuts': ','.join(sorted(m.cuts)),
+               'lazy': sum(solver.lazy.values()),
+               'finished': time.time()}
+        for phase in ('parse', 'propagation', 'build', 'solve', 'resolve'):
+            row[phase] = timings.get(phase)
+        names = [name for name, _ in COLUMNS]
+        with self._connect() as con:
+            con.execute("INSERT INTO results (%s) VALUES (%s)" %
+                        (', '.join(names), ', '.join('?' * len(names))),
+                        [row[name] for name in names])
+
+    def rows(self):
+        '''Every result as a dict, trajectory decoded.'''
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            rows = [dict(row) for row in
+                    con.execute("SELECT * FROM results "
+                                "ORDER BY instance_set, i, j")]
+        for row in rows:
+            row['trajectory'] = json.loads(row['trajectory'])
+        return rows
+
+    def solved(self, instance_set='j30'):
+        '''Instances (i, j) of instance_set with a recorded result.'''
+        with self._connect() as con:
+            return set(con.execute("SELECT DISTINCT i, j FROM results "
+                                   "WHERE instance_set = ?", (instance_set,)))
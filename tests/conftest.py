@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def j30():
+    '''The j30 instance files of the repository, as a psplib.Directory.'''
+    from psplib import Directory
+    return Directory('j30', os.path.join(ROOT, 'input', 'j30',
+                                         'j30%s_%s.sm'))
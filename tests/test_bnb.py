@@ -0,0 +1,43 @@
+import bnb
+from bnb import OPTIMAL, STOPPED, branch_and_bound
+from prcpsp import load, prepare
+
+
+def test_objective_at_least_lower_bound(j30):
+    m, x, _, _, _ = prepare(36, 1, corpus=j30, formulation='time')
+    solver = load(m, x, 36, 1, backend='bnb')
+    solver.set_time_limit(60)
+    solver.optimize()
+    assert solver.objective is not None
+    assert solver.objective >= m.lb[m.C_max]
+    assert solver.values[m.C_max] == solver.objective
+    assert m.violation(solver.values) < 1e-6
+
+
+def test_cutoff_from_elsewhere():
+    # two activities of two periods on one unit of one resource
+    args = ([2, 2], [[1], [1]], [1], [], [0, 0], [10, 10], 0)
+    result = branch_and_bound(*args, cutoff=lambda: 5)
+    assert (result.status, result.objective) == (OPTIMAL, 4)
+    result = branch_and_bound(*args, cutoff=lambda: 4)
+    assert (result.status, result.objective, result.bound) == \
+        (STOPPED, None, 4)
+
+
+def test_proves_optimum(j30):
+    m, x, _, _, _ = prepare(1, 1, corpus=j30, formulation='time')
+    solver = load(m, x, 1, 1, backend='bnb')
+    solver.set_time_limit(60)
+    solver.optimize()
+    assert (solver.status, solver.objective) == (OPTIMAL, 43)
+
+
+def test_forgetting_keeps_optimum(monkeypatch):
+    # three activities, the first and the last exceed the resource together
+    args = ([2, 3, 2], [[2], [1], [2]], [3], [(0, 2)], [0, 0, 0],
+            [10, 10, 10], 0)
+    expected = branch_and_bound(*args)
+    monkeypatch.setattr(bnb, 'SEEN_LIMIT', 1)
+    result = branch_and_bound(*args)
+    assert (result.status, result.objective) == \
+        (expected.status, expected.objective) == (OPTIMAL, 4)
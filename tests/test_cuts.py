@@ -0,0 +1,46 @@
+import pytest
+
+from backends import OPTIMAL
+from eventmodel import CUTS
+from prcpsp import load, prepare
+
+
+class Project(object):
+    '''A corpus of one small instance, given as lcalg.algorithm data.'''
+
+    name = 'small'
+
+    def __init__(self, p, r, extra=()):
+        n = len(p) + 2
+        self.data = {'n': n, 'T': sum(p), 'K': 1, 'R': [4],
+                     'p': [0] + p + [0],
+                     'r': [[0]] + [[demand] for demand in r] + [[0]],
+                     'A': [[(1, j) for j in range(2, n)]] +
+                          [[(i, n)] for i in range(2, n)]}
+        if extra:
+            self.data['A'].append(list(extra))
+
+    def __getitem__(self, key):
+        return self
+
+    def to_data(self):
+        return self.data
+
+
+def solve(corpus, cuts):
+    m, x, _, _, _ = prepare(1, 1, corpus=corpus, cuts=cuts)
+    solver = load(m, x, 1, 1, backend='highs')
+    solver.set_time_limit(60)
+    solver.optimize()
+    assert solver.status == OPTIMAL
+    return solver.objective
+
+
+@pytest.mark.parametrize('corpus', [
+    Project([2, 5, 5, 2, 3], [4, 1, 1, 4, 3]),
+    Project([5, 3, 6, 3, 6], [1, 4, 2, 1, 2], [(2, 4)]),
+    Project([4, 5, 3, 3, 2], [2, 1, 3, 4, 1], [(2, 4)]),
+    Project([4, 5, 4, 4, 5], [2, 2, 4, 2, 1], [(2, 4)]),
+])
+def test_cuts_keep_the_optimum(corpus):
+    assert solve(corpus, ()) == pytest.approx(solve(corpus, CUTS))
@@ -0,0 +1,17 @@
+import contextlib
+import io
+
+import heuristic
+import timemodel
+from prcpsp import get_constants
+
+
+def test_makespan_at_least_lower_bound(j30):
+    for i, j in j30.keys():
+        with contextlib.redirect_stdout(io.StringIO()):
+            n, N, T, K, p, p_minus, R, r, E, V, A, ES, LS, LB_2, _ = \
+                get_constants(i, j, corpus=j30)
+        m = timemodel.build(n, K, p, R, r, V, A, ES, LS, LB_2)
+        makespan = min(max(S[k] + p[k] for k in S) for S in
+                       heuristic.schedules(V, A, p, r, R, K, ES, LS))
+        assert makespan >= m.lb[m.C_max], (i, j)
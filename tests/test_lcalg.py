@@ -0,0 +1,30 @@
+import heuristic
+from lcalg import algorithm
+from prcpsp import get_constants
+
+
+def test_upper_bound_keeps_the_list_schedule(j30):
+    tightening = {}
+    algorithm(j30[39, 5].to_data(), tightening=tightening)
+    assert tightening['upper_bound'] == 3379
+    assert tightening['timetabling'] == 107
+    n, N, T, K, p, p_minus, R, r, E, V, A, ES, LS, LB_2, _ = \
+        get_constants(39, 5, corpus=j30)
+    S = min(heuristic.schedules(V, A, p, r, R, K, ES, LS),
+            key=lambda S: max(S[i] + p[i] for i in S))
+    assert all(ES['%s' % i] <= S[i] <= LS['%s' % i] for i in S)
+
+
+def test_path_consistency_tightens():
+    # jobs 2 and 5 overload the resource together, and a horizon one
+    # period above the chain 2 -> 4 leaves 2 no room after 5: immediate
+    # selection orders 5 after 2 and path consistency moves ES of 5 to 3
+    data = {'n': 6, 'T': 9, 'K': 1, 'R': [4],
+            'p': [0, 3, 5, 5, 2, 0],
+            'r': [[0], [3], [1], [1], [3], [0]],
+            'A': [[(1, 2), (1, 3), (1, 4), (1, 5)],
+                  [(2, 6)], [(3, 6)], [(4, 6)], [(5, 6)], [(2, 4)]]}
+    tightening = {}
+    ES = algorithm(data, tightening=tightening)[9]
+    assert tightening['path_consistency'] == 3
+    assert ES['5'] == 3
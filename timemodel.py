@@ -0,0 +1,170 @@
+'''Time-indexed preemptive formulation, the alternative to the event model
+for instances with short horizons. Time is cut into unit periods and
+x[i, t] says that activity i is processed in period [t, t + 1); columns
+exist only inside the lcalg window of each activity, the periods from
+ES[i] up to LS[i] + p[i]. Start and completion times S[i] and C[i] tie the
+periods of an activity to its precedences and to the makespan, with
+O(1) entries per period. Rows are stored as in eventmodel.Rows so the
+model loads into any backends.Backend.'''
+
+import collections
+
+import numpy as np
+
+from eventmodel import Rows
+
+
+class TimeModel(Rows):
+    '''Columns are x[i, t] for i in V and t in window[i], then S[i], C[i]
+    and C_max, with lb/ub, obj, vtype and names as in
+    eventmodel.EventModel. x of activity i are columns
+    start[i - V[0]]:start[i - V[0] + 1], for the periods window[i]. M is the
+    number of periods, recorded in place of the events. lazy and cuts are
+    always empty, neither applies to this formulation. p, demand, R, arcs,
+    ES and LS keep the instance over V for solvers that search schedules
+    directly (backends.BranchAndBoundBackend).'''
+
+    formulation = 'time'
+
+    def __init__(self, n, V, window):
+        Rows.__init__(self)
+        self.n, self.V, self.window = n, V, window
+        widths = [max(window[i][1] - window[i][0], 0) for i in V]
+        self.start = np.concatenate([[0], np.cumsum(widths)]).astype(int)
+        self._lo = np.array([window[i][0] for i in V], dtype=int)
+        self.nv = len(V)
+        self.s_off = int(self.start[-1])
+        self.c_off = self.s_off + self.nv
+        self.C_max = self.c_off + self.nv
+        self.num_vars = self.C_max + 1
+        self.M = max([window[i][1] for i in V] + [0])
+        self.lb = np.zeros(self.num_vars)
+        self.ub = np.full(self.num_vars, np.inf)
+        self.obj = np.zeros(self.num_vars)
+        self.vtype = np.full(self.num_vars, 'C')
+        self.names = \
+            ['x[%s,%s]' % (i, t) for i in V for t in range(*window[i])] + \
+            ['S[%s]' % i for i in V] + ['C[%s]' % i for i in V] + ['C_max']
+        self.lazy = Rows()
+        self.cuts = collections.Counter()
+
+    def x(self, i, t):
+        k = np.asarray(i) - self.V[0]
+        return self.start[k] + np.asarray(t) - self._lo[k]
+
+    def S(self, i):
+        return self.s_off + np.asarray(i) - self.V[0]
+
+    def C(self, i):
+        return self.c_off + np.asarray(i) - self.V[0]
+
+    def violation(self, x):
+        '''Largest violation of a bound, row or integrality by the column
+        values x, 0 for a feasible solution.'''
+        binary = self.vtype == 'B'
+        return max(self.residual(x).max(initial=0),
+                   (self.lb - x).max(), (x - self.ub).max(),
+                   abs(x[binary] - np.round(x[binary])).max(initial=0), 0)
+
+
+def windows(V, p, ES, LS, horizon):
+    '''Periods [lo, hi) in which each activity can be processed: from its
+    earliest start to its latest start plus its duration, at most
+    horizon. Activities of zero duration have none.'''
+    return dict((i, (ES['%s' % i],
+                     max(min(LS['%s' % i] + p[i], horizon), ES['%s' % i])
+                     if p[i] > 0 else ES['%s' % i]))
+                for i in V)
+
+
+def size(V, K, p, r, window):
+    '''Estimated nonzeros of the model: every x[i, t] is in its
+    assignment, start and completion rows and in a capacity row per
+    resource i uses.'''
+    return sum((window[i][1] - window[i][0]) *
+               (3 + sum(1 for k in range(K) if r[i][k] > 0))
+               for i in V if p[i] > 0)
+
+
+def build(n, K, p, R, r, V, A, ES, LS, LB_2):
+    '''TimeModel of the preemptive problem, arcs A and bounds from
+    prcpsp.get_constants. C_max lies between max(LB_2, ES[n]) and LS[n],
+    as in (53.1)/(53.2) of the event model.'''
+    C_lb, C_ub = max(int(LB_2), ES['%s' % n]), LS['%s' % n]
+    window = windows(V, p, ES, LS, C_ub)
+    m = TimeModel(n, V, window)
+    ii = np.array(V)
+    es = np.array([ES['%s' % i] for i in V])
+    ls = np.array([LS['%s' % i] for i in V])
+    dur = np.array([p[i] for i in V])
+    demand = np.array([r[i] for i in V]).reshape(len(V), K)
+    m.p, m.demand, m.R, m.arcs, m.ES, m.LS = \
+        dur, demand, np.array(R[:K]), list(A), es, ls
+
+    # variables
+    m.vtype[:m.s_off] = 'B'
+    m.ub[:m.s_off] = 1
+    m.lb[m.S(ii)], m.ub[m.S(ii)] = es, ls
+    m.lb[m.C(ii)], m.ub[m.C(ii)] = es + dur, ls + dur
+    m.lb[m.C_max], m.ub[m.C_max] = C_lb, C_ub
+    m.obj[m.C_max] = 1
+    # activity and period of every x column
+    act = np.repeat(ii, np.diff(m.start))
+    per = np.concatenate([np.arange(*window[i]) for i in V] +
+                         [np.zeros(0, dtype=int)])
+    cols = np.arange(m.s_off)
+
+    # (assign) every activity is processed for its whole duration
+    busy = [i for i in V if p[i] > 0]
+    m.add("(assign)", [(i,) for i in busy], '=', [p[i] for i in busy],
+          (np.searchsorted(busy, act), cols, 1))
+
+    # (capacity) sum_i r[i][k] * x[i, t] <= R[k]
+    for k in range(K):
+        use = demand[act - V[0], k]
+        used = use > 0
+        times, rows = np.unique(per[used], return_inverse=True)
+        m.add("(capacity)", [(k, t) for t in times.tolist()], '<', R[k],
+              (rows, cols[used], use[used]))
+
+    # (start) S[i] <= t where x[i, t] = 1, LS[i] otherwise
+    # (finish) C[i] >= t + 1 where x[i, t] = 1
+    k = np.arange(m.s_off)
+    keys = list(zip(act.tolist(), per.tolist()))
+    m.add("(start)", keys, '<', ls[act - V[0]], (k, m.S(act), 1),
+          (k, cols, ls[act - V[0]] - per))
+    m.add("(finish)", keys, '>', 0, (k, m.C(act), 1),
+          (k, cols, -(per + 1)))
+
+    # (duration) preempted or not, C[i] >= S[i] + p[i]
+    k = np.arange(len(V))
+    m.add("(duration)", [(i,) for i in V], '>', dur, (k, m.C(ii), 1),
+          (k, m.S(ii), -1))
+
+    # (precedence) S[j] >= C[i]
+    arcs = np.array(A, dtype=int).reshape(-1, 2)
+    k = np.arange(len(arcs))
+    m.add("(precedence)", [tuple(arc) for arc in arcs.tolist()], '>', 0,
+          (k, m.S(arcs[:, 1]), 1), (k, m.C(arcs[:, 0]), -1))
+
+    # (makespan) C_max >= C[i] for the activities without successors
+    last = np.array(sorted(set(V) - set(arcs[:, 0].tolist())), dtype=int)
+    k = np.arange(len(last))
+    m.add("(makespan)", [(i,) for i in last.tolist()], '>', 0,
+          (k, m.C_max, 1), (k, m.C(last), -1))
+    return m
+
+
+def schedule_solution(m, S, p):
+    '''Column values of the TimeModel m for the non-preemptive start times
+    S, None if an activity leaves its window.'''
+    x = np.zeros(m.num_vars)
+    for i in S:
+        lo, hi = m.window[i]
+        if p[i] > 0:
+            if S[i] < lo or S[i] + p[i] > hi:
+                return None
+            x[m.x(i, np.arange(S[i], S[i] + p[i]))] = 1
+        x[m.S(i)], x[m.C(i)] = S[i], S[i] + p[i]
+    x[m.C_max] = max(S[i] + p[i] for i in S)
+    return x